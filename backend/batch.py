@@ -0,0 +1,83 @@
+"""
+Batch Module - Gemini Batch API Integration
+Submits non-interactive workloads at the discounted batch rate
+"""
+
+import os
+import logging
+import json
+import tempfile
+from typing import Dict, Any, List
+from brain import build_prompt, MODEL_NAME, GENERATION_CONFIG, GEMINI_TOOLS, TOOL_CONFIG
+
+log = logging.getLogger("kuro.batch")
+
+_client = None  # google.genai client, created on first use and reused (keeps its HTTP session)
+
+def _get_client():
+    global _client
+    if _client is None:
+        from google import genai as genai_client
+        _client = genai_client.Client(api_key=os.getenv("GOOGLE_API_KEY"))
+    return _client
+
+def write_batch_file(messages: List[str], path: str) -> str:
+    """Write one GenerateContent request per message as JSONL"""
+    with open(path, "w", encoding="utf-8") as f:
+        for i, message in enumerate(messages):
+            request = {
+                "key": f"request-{i}",
+                "request": {
+                    "contents": [{"role": "user", "parts": [{"text": build_prompt(message)}]}],
+                    "generation_config": GENERATION_CONFIG,
+                    "tools": GEMINI_TOOLS,
+                    "tool_config": TOOL_CONFIG
+                }
+            }
+            f.write(json.dumps(request) + "\n")
+    return path
+
+def submit_batch(messages: List[str]) -> Dict[str, Any]:
+    """Upload a JSONL request file and create a batch job"""
+    try:
+        from google.genai import types
+    except ImportError:
+        return {"success": False, "message": "google-genai is not installed (see requirements-optional.txt)"}
+    
+    try:
+        client = _get_client()
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            path = write_batch_file(messages, os.path.join(tmp, "batch_requests.jsonl"))
+            uploaded = client.files.upload(
+                file=path,
+                config=types.UploadFileConfig(display_name="kuro-batch", mime_type="jsonl")
+            )
+        
+        job = client.batches.create(
+            model=MODEL_NAME,
+            src=uploaded.name,
+            config={"display_name": "kuro-batch"}
+        )
+        log.info("📦 Batch job submitted: %s (%d requests)", job.name, len(messages))
+        return {"success": True, "job": job.name, "state": str(job.state), "count": len(messages)}
+    except Exception as e:
+        log.error("❌ Batch Submit Error: %s", e)
+        return {"success": False, "message": str(e)}
+
+def get_batch_status(job_name: str) -> Dict[str, Any]:
+    """Fetch the state of a batch job"""
+    try:
+        client = _get_client()
+    except ImportError:
+        return {"success": False, "message": "google-genai is not installed (see requirements-optional.txt)"}
+    
+    try:
+        job = client.batches.get(name=job_name)
+        result = {"success": True, "job": job.name, "state": str(job.state)}
+        if job.dest and job.dest.file_name:
+            result["result_file"] = job.dest.file_name
+        return result
+    except Exception as e:
+        log.error("❌ Batch Status Error: %s", e)
+        return {"success": False, "message": str(e)}
@@ -4,16 +4,118 @@ Handles intent recognition and decision-making
 """
 
 import os
-import json
-from typing import Dict, Any, List, Union
+import sys
+import copy
+import asyncio
+import threading
+import logging
+import hashlib
+import datetime
+from typing import Dict, Any, AsyncIterator, List, Optional, Set, Tuple, Union
+import orjson
 import google.generativeai as genai
-from termcolor import colored
+from google.generativeai import caching
+from google.api_core.exceptions import NotFound, InvalidArgument, ResourceExhausted
+from memory import get_index
+from embeddings import embed_query
+from router import route_locally
+from semantic_cache import SemanticCache
+from tools import FUNCTION_DECLARATIONS
 
-# Configure Gemini
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+# Gemini is configured once in embeddings.py (shared gRPC channel)
+
+# Logging - per-request diagnostics only when KURO_DEBUG=1
+DEBUG = os.getenv("KURO_DEBUG") == "1"
+log = logging.getLogger("kuro.brain")
+
+# Model Configuration
+MODEL_NAME = "models/gemini-2.5-flash"
+GENERATION_CONFIG = {
+    "temperature": 0.3
+}
+
+# Native function calling - Gemini returns typed function calls (no JSON text
+# to parse); mode ANY forces a call, conversation goes through `reply`
+GEMINI_TOOLS = [{"function_declarations": FUNCTION_DECLARATIONS}]
+TOOL_CONFIG = {"function_calling_config": {"mode": "ANY"}}
+SAFETY_SETTINGS = {
+    "HARM_CATEGORY_DANGEROUS_CONTENT": "BLOCK_NONE",
+}
+
+# Interactive requests go to the Priority tier when the installed SDK can
+# express it (google-generativeai's GenerationConfig has no service_tier field
+# today, so this is probed once at import); over-quota calls use Standard
+PRIORITY_GENERATION_CONFIG = {**GENERATION_CONFIG, "service_tier": "PRIORITY"}
+
+def _priority_tier_supported() -> bool:
+    try:
+        genai.protos.GenerationConfig(**PRIORITY_GENERATION_CONFIG)
+        return True
+    except (ValueError, TypeError, AttributeError):
+        return False
+
+def _is_tier_rejection(e: Exception) -> bool:
+    """True only for errors about the service_tier field itself"""
+    return "service_tier" in str(e)
+
+_priority_tier_available = False  # Set by reload_model()
+
+# Gemini Context Caching - the static system prompt is registered once and
+# referenced by handle, so only context + message are sent per request
+PROMPT_CACHE_TTL = datetime.timedelta(seconds=3600)
+_prompt_cache: Optional[caching.CachedContent] = None
+_prompt_cache_unavailable = False
+_prompt_cache_lock = threading.Lock()  # Guards creating the cache (called from worker threads)
+
+# Model singletons - built once, reused by every request
+_MODEL: Optional[genai.GenerativeModel] = None
+_PRIORITY_MODEL: Optional[genai.GenerativeModel] = None
+_cached_models: Dict[bool, genai.GenerativeModel] = {}  # priority -> model on cached prompt
+
+def _build_model(generation_config: Dict[str, Any]) -> genai.GenerativeModel:
+    return genai.GenerativeModel(
+        MODEL_NAME,
+        generation_config=generation_config,
+        safety_settings=SAFETY_SETTINGS,
+        tools=GEMINI_TOOLS,
+        tool_config=copy.deepcopy(TOOL_CONFIG)  # The SDK converts nested dicts to protos in place
+    )
+
+def reload_model() -> None:
+    """(Re)build the model singletons, e.g. after changing config in tests"""
+    global _MODEL, _PRIORITY_MODEL, _priority_tier_available
+    
+    _MODEL = _build_model(GENERATION_CONFIG)
+    _priority_tier_available = _priority_tier_supported()
+    if _priority_tier_available:
+        _PRIORITY_MODEL = _build_model(PRIORITY_GENERATION_CONFIG)
+    else:
+        log.info("Priority tier not supported by the installed SDK, using Standard")
+        _PRIORITY_MODEL = None
+    _cached_models.clear()
+
+reload_model()
+
+# Semantic Decision Cache - reuse past decisions for near-identical messages
+# Opt-in: set KURO_SEMANTIC_CACHE=1 in .env
+SEMANTIC_CACHE_ENABLED = os.getenv("KURO_SEMANTIC_CACHE") == "1"
+DECISION_CACHE_NAMESPACE = "_decision_cache"
+DECISION_CACHE_THRESHOLD = 0.87
+DECISION_CACHE_MAXSIZE = 512
+
+# In-RAM tier in front of Pinecone: exact message or int8-quantized embedding match
+_decision_cache = SemanticCache(capacity=DECISION_CACHE_MAXSIZE, threshold=DECISION_CACHE_THRESHOLD)
+_background_tasks: Set[asyncio.Task] = set()  # Strong refs to fire-and-forget cache stores
+
+# Decide Workers - a fixed pool pulls requests off a queue, capping concurrent
+# Gemini calls at DECIDE_WORKERS however many requests are waiting
+DECIDE_WORKERS = int(os.getenv("KURO_DECIDE_WORKERS", "4"))
+_decide_queue: Optional[asyncio.Queue] = None
+_decide_workers: List[asyncio.Task] = []
 
 # System Prompt - Defines Kuro's personality and capabilities
-SYSTEM_PROMPT = """You are Kuro, a highly advanced AI with system-level control.
+# Static part (cacheable): personality, capabilities, rules, format
+SYSTEM_PROMPT_STATIC = """You are Kuro, a highly advanced AI with system-level control.
 
 **YOUR PERSONALITY:**
 - You are the computer's interface. You don't just talk; you act.
@@ -21,7 +123,7 @@ SYSTEM_PROMPT = """You are Kuro, a highly advanced AI with system-level control.
 
 **GOD MODE CAPABILITIES:**
 1.  **input_simulation** - Control Mouse & Keyboard
-    * `type`: Type text explicitly
+    * `type`: Type text explicitly (add "method": "keys" to send real keystrokes where pasting won't work)
     * `press`: Press specific keys (enter, esc, win, alt, tab)
     * `click`: Click mouse (left, right, double)
     * `move`: Move mouse to coordinates (x, y)
@@ -62,12 +164,11 @@ SYSTEM_PROMPT = """You are Kuro, a highly advanced AI with system-level control.
 - System actions are silent; do not use `reply` for them.
 
 **RESPONSE FORMAT:**
-{
-  "function": "function_name",
-  "arguments": { "param": "value" }
-}
+Call exactly one function with its arguments.
+For multi-step requests, call each function in the order it should run."""
 
-**MEMORY CONTEXT:**
+# Dynamic part (per request): memory context + user message
+SYSTEM_PROMPT_DYNAMIC = """**MEMORY CONTEXT:**
 {context}
 
 **USER MESSAGE:**
@@ -75,75 +176,312 @@ SYSTEM_PROMPT = """You are Kuro, a highly advanced AI with system-level control.
 
 **YOUR DECISION:**"""
 
-def decide_action(message: str, context: List[Dict[str, Any]]) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+SYSTEM_PROMPT = SYSTEM_PROMPT_STATIC + "\n\n" + SYSTEM_PROMPT_DYNAMIC
+
+def _split_template(template: str) -> Tuple[str, str, str]:
+    """Split a template into (prefix, middle, suffix) around {context} and {message}"""
+    prefix, rest = template.split('{context}', 1)
+    middle, suffix = rest.split('{message}', 1)
+    return prefix, middle, suffix
+
+# Pre-split once at import so building a prompt is a single join, and memory
+# content containing "{message}" can't be clobbered by a second replace
+# Fragments are interned so every request shares one copy of the static text
+_PRE, _MID, _SUF = map(sys.intern, _split_template(SYSTEM_PROMPT))
+_DYN_PRE, _DYN_MID, _DYN_SUF = map(sys.intern, _split_template(SYSTEM_PROMPT_DYNAMIC))
+SYSTEM_PROMPT_STATIC = sys.intern(SYSTEM_PROMPT_STATIC)
+
+def _decision_cache_key(message: str) -> str:
+    """Normalize a message for exact-match lookups"""
+    return message.strip().lower()
+
+def lookup_cached_decision(message: str) -> Tuple[Optional[Any], Optional[List[float]]]:
     """
-    Send message + context to Gemini and get back a function call decision
+    Look up a previous decision for this message.
+    Returns (decision, embedding) - the embedding is reused on a miss for storing.
     """
+    key = _decision_cache_key(message)
+    decision = _decision_cache.get(key)
+    if decision is not None:
+        log.debug("⚡ Decision cache hit (RAM)")
+        return decision, None
     
-    # Format context for prompt
-    context_str = "\n".join([f"- {item['content']}" for item in context]) if context else "No previous context"
+    embedding = list(embed_query(message))
+    if not any(embedding):
+        return None, None
     
-    # Build prompt using string replacement to avoid .format() issues with JSON braces
-    prompt = SYSTEM_PROMPT.replace('{context}', context_str).replace('{message}', message)
+    hit = _decision_cache.search(embedding)
+    if hit is not None:
+        log.debug("⚡ Decision cache hit (RAM, score %.2f)", hit[1])
+        return hit[0], None
     
     try:
-        # Use Gemini 1.5 Flash (Higher rate limits, more stable for free tier)
-        model = genai.GenerativeModel(
-            'gemini-2.5-flash',
-            generation_config={
-                "response_mime_type": "application/json",
-                "temperature": 0.3
-            },
-            safety_settings={
-                "HARM_CATEGORY_DANGEROUS_CONTENT": "BLOCK_NONE",
-            }
+        index = get_index()
+        results = index.query(
+            vector=embedding,
+            top_k=1,
+            include_metadata=True,
+            namespace=DECISION_CACHE_NAMESPACE
         )
+        if results.matches and results.matches[0].score >= DECISION_CACHE_THRESHOLD:
+            decision = orjson.loads(results.matches[0].metadata["decision"])
+            _decision_cache.put(key, embedding, decision)
+            log.debug("⚡ Decision cache hit (score %.2f)", results.matches[0].score)
+            return decision, embedding
+    except Exception as e:
+        log.warning("⚠️ Decision cache lookup failed: %s", e)
+    
+    return None, embedding
+
+def store_cached_decision(message: str, embedding: Optional[List[float]], decision: Any) -> None:
+    """Store a fresh Gemini decision in both cache tiers"""
+    key = _decision_cache_key(message)
+    _decision_cache.put(key, embedding, decision)
+    
+    if not embedding:
+        return
+    
+    try:
+        index = get_index()
+        cache_id = f"dec_{hashlib.sha1(key.encode('utf-8')).hexdigest()}"
+        index.upsert(
+            vectors=[(cache_id, embedding, {"message": message, "decision": orjson.dumps(decision).decode("utf-8")})],
+            namespace=DECISION_CACHE_NAMESPACE
+        )
+    except Exception as e:
+        log.warning("⚠️ Decision cache store failed: %s", e)
+
+def build_prompt(message: str, context_str: str = "No previous context") -> str:
+    """Build the full (uncached) prompt for a message"""
+    return f"{_PRE}{context_str}{_MID}{message}{_SUF}"
+
+def _get_cached_model(priority: bool) -> Optional[genai.GenerativeModel]:
+    """
+    Get (or build once) a model bound to the cached system prompt.
+    Returns None when context caching is unavailable (e.g. prompt below the
+    minimum cacheable size) so callers fall back to sending the full prompt.
+    """
+    global _prompt_cache, _prompt_cache_unavailable
+    
+    model = _cached_models.get(priority)
+    if model is not None or _prompt_cache_unavailable:
+        return model
+    
+    # Concurrent first requests must not each create (and pay for) a cache
+    with _prompt_cache_lock:
+        if _prompt_cache_unavailable:
+            return None
         
-        response = model.generate_content(prompt)
-        
-        # Debug: Print raw response
-        print(colored(f"📝 Raw Gemini response: {response.text[:200]}...", "cyan"))
+        if _prompt_cache is None:
+            try:
+                _prompt_cache = caching.CachedContent.create(
+                    model=MODEL_NAME,
+                    system_instruction=SYSTEM_PROMPT_STATIC,
+                    tools=GEMINI_TOOLS,
+                    tool_config=copy.deepcopy(TOOL_CONFIG),
+                    ttl=PROMPT_CACHE_TTL
+                )
+                log.info("✅ System prompt cached: %s", _prompt_cache.name)
+            except Exception as e:
+                log.warning("⚠️ Context caching unavailable, sending full prompt: %s", e)
+                _prompt_cache_unavailable = True
+                return None
         
-        # Parse JSON response
+        if priority not in _cached_models:
+            _cached_models[priority] = genai.GenerativeModel.from_cached_content(
+                cached_content=_prompt_cache,
+                generation_config=PRIORITY_GENERATION_CONFIG if priority else GENERATION_CONFIG,
+                safety_settings=SAFETY_SETTINGS
+            )
+        return _cached_models[priority]
+
+def _reset_prompt_cache() -> None:
+    """Drop the cached-content handle (expired or deleted server-side)"""
+    global _prompt_cache
+    with _prompt_cache_lock:
+        _prompt_cache = None
+        _cached_models.clear()
+
+async def _generate_with(context_str: str, message: str, priority: bool, stream: bool = False):
+    """Call Gemini, using the cached system prompt when available"""
+    dynamic_prompt = f"{_DYN_PRE}{context_str}{_DYN_MID}{message}{_DYN_SUF}"
+    
+    # Fast path: model already bound to the cached prompt (no thread hop)
+    cached_model = _cached_models.get(priority)
+    if cached_model is None and not _prompt_cache_unavailable:
+        cached_model = await asyncio.to_thread(_get_cached_model, priority)
+    if cached_model is not None:
         try:
-            decision = json.loads(response.text)
-        except json.JSONDecodeError as e:
-            print(colored(f"❌ JSON Parse Error: {e}", "red"))
-            print(colored(f"Raw response: {response.text}", "yellow"))
-            
-            # Fallback to simple reply
-            return {
-                "function": "reply",
-                "arguments": {
-                    "message": "I'm having trouble processing that request."
-                }
-            }
+            return await cached_model.generate_content_async(dynamic_prompt, stream=stream)
+        except NotFound:
+            # Cache expired - refresh the handle and retry once
+            log.info("🔄 Cached prompt expired, refreshing...")
+            _reset_prompt_cache()
+            cached_model = await asyncio.to_thread(_get_cached_model, priority)
+            if cached_model is not None:
+                return await cached_model.generate_content_async(dynamic_prompt, stream=stream)
+    
+    # Fallback: send the full prompt
+    model = _PRIORITY_MODEL if priority else _MODEL
+    return await model.generate_content_async(build_prompt(message, context_str), stream=stream)
+
+async def _generate(context_str: str, message: str, stream: bool = False):
+    """Call Gemini on the Priority tier, falling back to Standard"""
+    global _priority_tier_available
+    
+    if _priority_tier_available and _PRIORITY_MODEL is not None:
+        try:
+            return await _generate_with(context_str, message, priority=True, stream=stream)
+        except ResourceExhausted as e:
+            log.warning("⚠️ Priority tier over quota, using Standard: %s", e)
+        except (ValueError, InvalidArgument) as e:
+            if not _is_tier_rejection(e):
+                raise  # A bad request, not a tier problem - Standard would fail too
+            log.warning("⚠️ Priority tier unsupported, using Standard: %s", e)
+            _priority_tier_available = False
+    
+    return await _generate_with(context_str, message, priority=False, stream=stream)
+
+def _arg_value(value: Any) -> Any:
+    """Function-call args arrive as protobuf Struct values (numbers are floats)"""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+def _actions_from_parts(parts) -> List[Dict[str, Any]]:
+    """Convert Gemini function-call parts into decision dicts"""
+    return [
+        {
+            "function": part.function_call.name,
+            "arguments": {k: _arg_value(v) for k, v in part.function_call.args.items()}
+        }
+        for part in parts
+        if part.function_call.name
+    ]
+
+def _text_or_default(response) -> str:
+    try:
+        return response.text or "I'm here."
+    except ValueError:
+        return "I'm here."
+
+async def decide_action_stream(message: str, context_str: str, use_router: bool = True) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Yield function call decisions one by one as Gemini streams them, so the
+    caller can start executing the first action while later ones generate.
+    context_str is the preformatted memory list from retrieve_context.
+    Pass use_router=False if the caller already tried route_locally.
+    """
+    
+    # Cheap local classifier first - only ambiguous messages reach Gemini
+    if use_router:
+        routed = await asyncio.to_thread(route_locally, message)
+        if routed is not None:
+            yield routed
+            return
+    
+    # Short-circuit on a semantically equivalent past message
+    cache_embedding = None
+    if SEMANTIC_CACHE_ENABLED:
+        cached, cache_embedding = await asyncio.to_thread(lookup_cached_decision, message)
+        if cached is not None:
+            for action in (cached if isinstance(cached, list) else [cached]):
+                yield action
+            return
+    
+    context_str = context_str or "No previous context"
+    actions: List[Dict[str, Any]] = []
+    
+    try:
+        # Prompt is built from pre-split fragments to avoid .format() issues with JSON braces
+        response = await _generate(context_str, message, stream=True)
         
-        # Handle list of actions (multi-step)
-        if isinstance(decision, list):
-            print(colored(f"🧠 Kuro decided on {len(decision)} actions", "magenta"))
-            for i, action in enumerate(decision):
-                print(colored(f"  {i+1}. {action.get('function', 'unknown')}", "magenta"))
-        else:
-            print(colored(f"🧠 Kuro decided: {decision.get('function', 'unknown')}", "magenta"))
+        async for chunk in response:
+            if not chunk.candidates:
+                continue
+            for action in _actions_from_parts(chunk.candidates[0].content.parts):
+                log.debug("🧠 Kuro decided: %s", action["function"])
+                actions.append(action)
+                yield action
         
-        return decision
+        if not actions:
+            # No call despite mode ANY - treat any text as a spoken reply
+            action = {"function": "reply", "arguments": {"message": _text_or_default(response)}}
+            actions.append(action)
+            yield action
         
     except Exception as e:
-        print(colored(f"❌ Gemini Error: {e}", "red"))
-        print(colored(f"Error type: {type(e).__name__}", "red"))
+        log.error("❌ Gemini Error (%s): %s", type(e).__name__, e)
         
-        # Print full traceback for debugging
-        import traceback
-        print(colored("Full traceback:", "yellow"))
-        traceback.print_exc()
+        # Full traceback only when debugging (avoids formatting it per error)
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Full traceback:", exc_info=True)
         
-        return {
-            "function": "reply",
-            "arguments": {
-                "message": "Something went wrong. Please try again."
+        if not actions:
+            yield {
+                "function": "reply",
+                "arguments": {
+                    "message": "Something went wrong. Please try again."
+                }
             }
-        }
+        return
+    
+    if SEMANTIC_CACHE_ENABLED:
+        # Off the critical path - the stream ends (and the reply goes out)
+        # without waiting for the Pinecone upsert
+        decision = actions[0] if len(actions) == 1 else actions
+        task = asyncio.create_task(asyncio.to_thread(store_cached_decision, message, cache_embedding, decision))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+async def _decide_worker() -> None:
+    """Run queued decisions, forwarding each streamed action to the requester"""
+    while True:
+        message, context_str, use_router, out = await _decide_queue.get()
+        try:
+            async for action in decide_action_stream(message, context_str, use_router):
+                out.put_nowait(action)
+        except Exception as e:
+            out.put_nowait(e)
+        finally:
+            out.put_nowait(None)  # End of stream
+
+def start_decide_workers() -> None:
+    """Spawn the decide worker pool on the running event loop (idempotent)"""
+    global _decide_queue
+    if _decide_workers:
+        return
+    
+    _decide_queue = asyncio.Queue()
+    _decide_workers.extend(asyncio.create_task(_decide_worker()) for _ in range(DECIDE_WORKERS))
+
+async def decide_action_queued(message: str, context_str: str, use_router: bool = True) -> AsyncIterator[Dict[str, Any]]:
+    """decide_action_stream through the worker pool (direct if the pool isn't running)"""
+    if _decide_queue is None:
+        async for action in decide_action_stream(message, context_str, use_router):
+            yield action
+        return
+    
+    if _decide_queue.qsize():
+        log.debug("⏳ Waiting for a decide worker (%d queued)", _decide_queue.qsize())
+    
+    out: asyncio.Queue = asyncio.Queue()
+    _decide_queue.put_nowait((message, context_str, use_router, out))
+    while True:
+        item = await out.get()
+        if item is None:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+async def decide_action(message: str, context_str: str) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    Send message + context to Gemini and get back a function call decision
+    (a single dict, or a list for multi-step requests)
+    """
+    actions = [action async for action in decide_action_stream(message, context_str)]
+    return actions[0] if len(actions) == 1 else actions
 
 def generate_natural_response(result: Dict[str, Any]) -> str:
     """
@@ -0,0 +1,172 @@
+"""
+Embeddings Module - Cached, Batched Embeddings
+Shares one embedding lookup between memory retrieval and the decision cache,
+and coalesces concurrent requests into batched embed_content calls
+"""
+
+import os
+import logging
+import asyncio
+import threading
+from collections import OrderedDict, namedtuple
+from typing import Optional, Tuple
+import google.generativeai as genai
+
+log = logging.getLogger("kuro.embeddings")
+
+EMBEDDING_MODEL = "models/text-embedding-004"
+EMBEDDING_DIM = 768
+_ZERO_VECTOR = (0.0,) * EMBEDDING_DIM  # Error fallback - immutable, so one shared instance
+
+# Dynamic batching - texts queued within EMBED_BATCH_DELAY of each other share
+# one embed_content call (up to EMBED_BATCH_SIZE texts)
+EMBED_BATCH_SIZE = 32
+EMBED_BATCH_DELAY = 0.005  # seconds; kept small since every /kuro request waits on it
+EMBED_CACHE_SIZE = 1024
+
+# Configure Gemini once for the whole backend. The SDK's default transports
+# (gRPC for sync clients, gRPC-asyncio for async ones) each keep one persistent
+# channel, so TLS is negotiated once rather than per request.
+genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+
+# LRU cache shared by the sync and batched paths (same fields as functools.lru_cache)
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+_cache: "OrderedDict[str, Tuple[float, ...]]" = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0}
+
+# Batcher state, set by start_embed_batcher() on the server's event loop
+_queue: Optional[asyncio.Queue] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_batch_task: Optional[asyncio.Task] = None
+
+def _cache_get(text: str) -> Optional[Tuple[float, ...]]:
+    with _cache_lock:
+        vector = _cache.get(text)
+        if vector is None:
+            _cache_stats["misses"] += 1
+            return None
+        _cache.move_to_end(text)
+        _cache_stats["hits"] += 1
+        return vector
+
+def _cache_put(text: str, vector: Tuple[float, ...]) -> None:
+    with _cache_lock:
+        _cache[text] = vector
+        _cache.move_to_end(text)
+        if len(_cache) > EMBED_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+def cache_info() -> CacheInfo:
+    """Hit/miss counters for /debug/cache"""
+    with _cache_lock:
+        return CacheInfo(_cache_stats["hits"], _cache_stats["misses"], EMBED_CACHE_SIZE, len(_cache))
+
+def _embed_one(text: str) -> Tuple[float, ...]:
+    """Single embed_content call (errors propagate so they are never cached)"""
+    result = genai.embed_content(
+        model=EMBEDDING_MODEL,
+        content=text,
+        task_type="retrieval_document"
+    )
+    vector = tuple(result['embedding'])
+    _cache_put(text, vector)
+    return vector
+
+async def _embed_loop() -> None:
+    """Drain the queue into batches and resolve each caller's future"""
+    loop = asyncio.get_running_loop()
+
+    while True:
+        batch = [await _queue.get()]
+        deadline = loop.time() + EMBED_BATCH_DELAY
+        while len(batch) < EMBED_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(_queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            result = await genai.embed_content_async(
+                model=EMBEDDING_MODEL,
+                content=texts,
+                task_type="retrieval_document"
+            )
+            vectors = {text: tuple(values) for text, values in zip(texts, result['embedding'])}
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            continue
+
+        for text, vector in vectors.items():
+            _cache_put(text, vector)
+        for text, future in batch:
+            if not future.done():
+                future.set_result(vectors[text])
+
+def start_embed_batcher() -> None:
+    """Start the batching task on the running event loop (idempotent)"""
+    global _queue, _loop, _batch_task
+    if _batch_task is not None and not _batch_task.done():
+        return
+
+    _queue = asyncio.Queue()
+    _loop = asyncio.get_running_loop()
+    _batch_task = _loop.create_task(_embed_loop())
+
+async def _embed_batched(text: str) -> Tuple[float, ...]:
+    future = _loop.create_future()
+    _queue.put_nowait((text, future))
+    return await future
+
+def _embed(text: str) -> Tuple[float, ...]:
+    """Embed from sync code - worker threads join the batcher when it is running"""
+    vector = _cache_get(text)
+    if vector is not None:
+        return vector
+
+    if _batch_task is None or _batch_task.done():
+        return _embed_one(text)
+
+    try:
+        on_loop = asyncio.get_running_loop() is _loop
+    except RuntimeError:
+        on_loop = False
+    if on_loop:
+        return _embed_one(text)  # Can't block the loop waiting on itself
+
+    return asyncio.run_coroutine_threadsafe(_embed_batched(text), _loop).result()
+
+def embed_text(text: str) -> Tuple[float, ...]:
+    """Embed text as-is (used when storing memories)"""
+    try:
+        return _embed(text)
+    except Exception as e:
+        log.error("❌ Embedding Error: %s", e)
+        return _ZERO_VECTOR  # Return zero vector on error
+
+def embed_query(text: str) -> Tuple[float, ...]:
+    """Embed a query string, reusing results for repeated (normalized) text"""
+    return embed_text(text.strip().lower())
+
+async def embed_query_async(text: str) -> Tuple[float, ...]:
+    """Non-blocking embed_query for use inside the event loop"""
+    text = text.strip().lower()
+    try:
+        vector = _cache_get(text)
+        if vector is not None:
+            return vector
+        if _batch_task is None or _batch_task.done():
+            return await asyncio.to_thread(_embed_one, text)
+        return await _embed_batched(text)
+    except Exception as e:
+        log.error("❌ Embedding Error: %s", e)
+        return _ZERO_VECTOR  # Return zero vector on error
+
+# Hit-rate monitoring (exposed on /debug/cache)
+embed_query.cache_info = cache_info
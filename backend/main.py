@@ -4,28 +4,51 @@ Main entry point for the Kuro AI Assistant
 """
 
 import os
-from fastapi import FastAPI, HTTPException
+import re
+import time
+import queue
+import asyncio
+import logging
+import logging.handlers
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import httpx
+from fastapi import BackgroundTasks, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field
 from dotenv import load_dotenv
-from termcolor import colored
 
 # Load environment variables
 load_dotenv()
 
+# Logging - per-request diagnostics only when KURO_DEBUG=1 (KURO_LOG_LEVEL=WARNING
+# for quiet production). Records are queued and written by a listener thread,
+# so request handlers never block on stdout.
+DEBUG = os.getenv("KURO_DEBUG") == "1"
+LOG_LEVEL = logging.DEBUG if DEBUG else os.getenv("KURO_LOG_LEVEL", "INFO").upper()
+_log_queue = queue.SimpleQueue()
+_log_listener = logging.handlers.QueueListener(_log_queue, logging.StreamHandler())
+logging.basicConfig(level=LOG_LEVEL, format="%(message)s", handlers=[logging.handlers.QueueHandler(_log_queue)])
+_log_listener.start()
+log = logging.getLogger("kuro.main")
+
 # Import Kuro modules
-from memory import init_pinecone, retrieve_context
-from brain import decide_action, generate_natural_response
-from tools import execute_function, AVAILABLE_TOOLS, web_scrape_tool
+from memory import init_pinecone, prewarm_index, retrieve_context_async, start_upsert_flusher, flush_upserts, TOP_K
+from brain import decide_action_queued, start_decide_workers, generate_natural_response
+from tools import execute_function, AVAILABLE_TOOLS_JSON, web_scrape_tool, start_cpu_sampler, prewarm_volume
+from embeddings import embed_query, embed_query_async, start_embed_batcher
+from batch import submit_batch, get_batch_status
+from router import prewarm_router, route_locally, router_stats
 # Add TTS
 from tts import tts_engine
-from fastapi.responses import Response
+from fastapi.responses import FileResponse, ORJSONResponse, Response, StreamingResponse
 
 # Initialize FastAPI
 app = FastAPI(
     title="Kuro AI Assistant",
     description="Jarvis-style function-driven AI backend",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse  # orjson encodes faster than stdlib json
 )
 
 # CORS Configuration
@@ -37,41 +60,126 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Request Models
+# Max seconds startup waits on connection prewarming
+WARMUP_TIMEOUT = 15
+
+# HTTP/2 needs the optional h2 package (pip install "httpx[http2]")
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# In-flight /kuro requests keyed by normalized message (request coalescing)
+_inflight: Dict[str, "asyncio.Future[KuroResponse]"] = {}
+
+# Tools that act on whatever window has focus - never run concurrently
+FOCUS_DEPENDENT_FUNCS = {"input_simulation", "window_ops"}
+
+# Exact-match response cache keyed by normalized message. Only responses made
+# purely of side-effect-free functions are cached - "volume up" must run again.
+RESPONSE_CACHE_TTL = 600  # seconds
+RESPONSE_CACHE_MAXSIZE = 1024
+CACHEABLE_FUNCS = {"reply", "recall_memory"}
+# Free-form replies go stale sooner than recalls (which save_memory invalidates)
+REPLY_CACHE_TTL = int(os.getenv("KURO_REPLY_CACHE_TTL", "30"))  # seconds, 0 = never cache
+# Questions whose answer changes with the clock are never served from cache
+_TIME_SENSITIVE_RE = re.compile(
+    r"\b(time|date|day|today|tonight|tomorrow|yesterday|now|current|latest|weather|clock|hour|minute|week|month|year)\b",
+    re.IGNORECASE
+)
+_response_cache: "OrderedDict[str, Tuple[float, KuroResponse]]" = OrderedDict()
+_response_cache_stats = {"hits": 0, "misses": 0}
+
+# Request Models - validation (including empty-input rejection) runs in pydantic-core
 class KuroRequest(BaseModel):
-    message: str
+    model_config = ConfigDict(extra="forbid", str_strip_whitespace=True)
+    
+    message: str = Field(min_length=1)
 
 class KuroResponse(BaseModel):
+    # Frozen: one instance may be shared by coalesced requests and the response cache
+    model_config = ConfigDict(frozen=True, ser_json_bytes="utf8")
+    
     reply: str
-    function_called: str = None
+    function_called: Optional[str] = None
     success: bool = True
 
 class TTSRequest(BaseModel):
-    text: str
+    model_config = ConfigDict(extra="forbid")
+    
+    text: str = Field(min_length=1)
+
+class BatchRequest(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    
+    messages: List[str]
 
 # Initialize Pinecone on startup
 @app.on_event("startup")
 async def startup_event():
-    print(colored("=" * 60, "cyan"))
-    print(colored("🚀 KURO AI ASSISTANT - INITIALIZING", "cyan", attrs=["bold"]))
-    print(colored("=" * 60, "cyan"))
+    log.info("=" * 60)
+    log.info("🚀 KURO AI ASSISTANT - INITIALIZING")
+    log.info("=" * 60)
     
     # Check environment variables
     required_vars = ["GOOGLE_API_KEY", "PINECONE_API_KEY", "PINECONE_INDEX_NAME"]
     missing_vars = [var for var in required_vars if not os.getenv(var)]
     
     if missing_vars:
-        print(colored(f"❌ Missing environment variables: {', '.join(missing_vars)}", "red"))
-        print(colored("⚠️ Please create a .env file with required keys", "yellow"))
+        log.error("❌ Missing environment variables: %s", ", ".join(missing_vars))
+        log.warning("⚠️ Please create a .env file with required keys")
     else:
-        print(colored("✅ Environment variables loaded", "green"))
+        log.info("✅ Environment variables loaded")
     
-    # Initialize Pinecone
+    # Initialize Pinecone (memory saves are batched by a background flusher)
     init_pinecone()
+    start_upsert_flusher()
+    
+    # Coalesce concurrent embedding calls into batched requests
+    start_embed_batcher()
+    
+    # Fixed pool of Gemini decide workers
+    start_decide_workers()
     
-    print(colored("=" * 60, "cyan"))
-    print(colored("✅ KURO IS READY", "green", attrs=["bold"]))
-    print(colored("=" * 60, "cyan"))
+    # Keep a CPU reading ready for system_info
+    start_cpu_sampler()
+    
+    # One pooled HTTP client for the whole app (keep-alive connections reused)
+    app.state.http = httpx.AsyncClient(
+        http2=HTTP2_AVAILABLE,  # Concurrent Groq TTS calls multiplex over one TLS connection
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=300)
+    )
+    tts_engine.init_async(app.state.http)
+    
+    # Prewarm - open the Gemini/Pinecone/Groq connections and build the router index
+    # now, so the first request doesn't pay for them
+    try:
+        await asyncio.wait_for(asyncio.gather(
+            embed_query_async("warmup"),
+            asyncio.to_thread(prewarm_index),
+            asyncio.to_thread(prewarm_router),
+            asyncio.to_thread(prewarm_volume),
+            tts_engine.prewarm()
+        ), timeout=WARMUP_TIMEOUT)
+        log.info("✅ Connections warmed up")
+    except Exception as e:
+        log.warning("⚠️ Warmup incomplete (%s): %s", type(e).__name__, e)
+    
+    log.info("=" * 60)
+    log.info("✅ KURO IS READY")
+    log.info("=" * 60)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Don't lose memories saved in the last flush interval
+    try:
+        await asyncio.to_thread(flush_upserts)
+    except Exception as e:
+        log.error("❌ Memory Flush Error: %s", e)
+    
+    await app.state.http.aclose()
+    _log_listener.stop()  # Flush queued log records
 
 # Health Check
 @app.get("/")
@@ -84,60 +192,152 @@ async def root():
 
 # Main Kuro Endpoint
 @app.post("/kuro", response_model=KuroResponse)
-async def kuro_endpoint(request: KuroRequest):
+async def kuro_endpoint(request: KuroRequest, background: BackgroundTasks):
+    """
+    Main AI pipeline entry point.
+    Identical messages arriving while one is in flight share its result;
+    repeats of side-effect-free requests are answered from the response cache.
+    """
+    
+    message = request.message  # Stripped and checked non-empty by KuroRequest
+    key = message.lower()
+    cached = _response_cache.get(key)
+    if cached is not None and cached[0] > time.monotonic():
+        _response_cache.move_to_end(key)
+        _response_cache_stats["hits"] += 1
+        log.debug("⚡ Response cache hit: %s", message)
+        return cached[1]
+    _response_cache_stats["misses"] += 1
+    
+    pending = _inflight.get(key)
+    if pending is not None:
+        log.debug("🔗 Coalesced with in-flight request: %s", message)
+        try:
+            return await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            if not pending.cancelled():
+                raise  # This request itself was cancelled
+            # The leading request failed - run our own pipeline below
+    
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        response = await run_pipeline(message)
+        _cache_response(key, response)
+        future.set_result(response)
+        if DEBUG:
+            background.add_task(_log_interaction, response)
+        return response
+    except BaseException:
+        future.cancel()
+        raise
+    finally:
+        if _inflight.get(key) is future:
+            del _inflight[key]
+
+def _log_interaction(response: KuroResponse) -> None:
+    """Per-request summary, written after the response has been sent"""
+    log.debug("🤖 KURO: %s", response.reply)
+    log.debug("=" * 60)
+
+def _cache_response(key: str, response: KuroResponse) -> None:
+    """Store a response if every function behind it is side-effect free"""
+    functions = set((response.function_called or "").split(","))
+    if "save_memory" in functions:
+        _response_cache.clear()  # Cached recalls/replies may be out of date now
+    
+    if not response.success or not functions <= CACHEABLE_FUNCS:
+        return
+    
+    ttl = RESPONSE_CACHE_TTL
+    if "reply" in functions:
+        if _TIME_SENSITIVE_RE.search(key):
+            return
+        ttl = min(ttl, REPLY_CACHE_TTL)
+    if ttl <= 0:
+        return
+    
+    _response_cache[key] = (time.monotonic() + ttl, response)
+    _response_cache.move_to_end(key)
+    if len(_response_cache) > RESPONSE_CACHE_MAXSIZE:
+        _response_cache.popitem(last=False)
+
+async def _execute_action(action: Dict[str, Any], wait_for: List["asyncio.Task"]) -> Dict[str, Any]:
+    """Run one tool call in the thread pool, after the given earlier actions"""
+    if wait_for:
+        await asyncio.wait(wait_for)
+    return await asyncio.to_thread(execute_function, action["function"], action.get("arguments", {}))
+
+async def _single_decision(action: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+    """Wrap a locally routed decision so it reads like a Gemini decision stream"""
+    yield action
+
+async def run_pipeline(message: str) -> KuroResponse:
     """
     Main AI pipeline:
-    1. Retrieve relevant context from memory
+    1. Retrieve relevant context from memory (skipped for locally routed commands)
     2. Send to Gemini for intent recognition
     3. Execute the decided function
     4. Return natural language response
     """
     
-    message = request.message.strip()
-    
-    if not message:
-        raise HTTPException(status_code=400, detail="Message cannot be empty")
-    
-    print(colored("\n" + "=" * 60, "cyan"))
-    print(colored(f"👤 USER: {message}", "white", attrs=["bold"]))
-    print(colored("=" * 60, "cyan"))
+    if DEBUG:
+        log.debug("\n" + "=" * 60)
+        log.debug("👤 USER: %s", message)
+        log.debug("=" * 60)
     
     try:
-        # Step 1: Retrieve Context
-        print(colored("🔍 Retrieving context from memory...", "yellow"))
-        context = retrieve_context(message, top_k=3)
-        
-        # Step 2: Decide Action
-        print(colored("🧠 Consulting Gemini...", "yellow"))
-        decision = decide_action(message, context)
+        # Step 1: Local classifier - trivial commands need neither memory nor Gemini
+        routed = await asyncio.to_thread(route_locally, message)
         
-        # Validate decision structure
-        if isinstance(decision, dict):
-            # Normalize single decision to list
-            actions = [decision]
-        elif isinstance(decision, list):
-            actions = decision
-            if not actions:
-                raise ValueError("Empty decision list received")
+        if routed is not None:
+            log.debug("⏭️ Skipping memory lookup for %s", routed["function"])
+            decisions = _single_decision(routed)
         else:
-            raise ValueError(f"Invalid decision format: expected dict or list, got {type(decision)}")
+            # Retrieve Context (embedding is computed once and reused)
+            log.debug("🔍 Retrieving context from memory...")
+            embedding = await embed_query_async(message)
+            _, context_str = await retrieve_context_async(embedding, top_k=TOP_K)
+            
+            log.debug("🧠 Consulting Gemini...")
+            decisions = decide_action_queued(message, context_str, use_router=False)
         
-        results = []
+        # Step 2 + 3: Decide and Execute - actions are dispatched as soon as
+        # Gemini streams them. Tools block (subprocess, pyautogui, disk), so
+        # they run in the thread pool to keep the event loop free.
+        tasks = []
         function_names = []
+        ordered = False
         
-        # Step 3: Execute Function(s)
-        for action in actions:
-            if "function" not in action:
-                print(colored(f"⚠️ Skipping invalid action: {action}", "red"))
+        async for action in decisions:
+            if not isinstance(action, dict) or "function" not in action:
+                log.warning("⚠️ Skipping invalid action: %s", action)
                 continue
-                
-            function_name = action.get("function")
-            arguments = action.get("arguments", {})
+            
+            function_name = action["function"]
             function_names.append(function_name)
+            log.debug("⚙️ Executing: %s", function_name)
             
-            print(colored(f"⚙️ Executing: {function_name}", "yellow"))
-            result = execute_function(function_name, arguments)
-            results.append(result)
+            # Focus-dependent actions (typing, window ops) and everything after
+            # them must wait for the earlier actions to finish
+            ordered = ordered or function_name in FOCUS_DEPENDENT_FUNCS
+            tasks.append(asyncio.create_task(
+                _execute_action(action, list(tasks) if ordered else [])
+            ))
+        
+        if not tasks:
+            raise ValueError("Empty decision list received")
+        
+        # Fast path - almost every request is a single action
+        if len(tasks) == 1:
+            result = await tasks[0]
+            return KuroResponse(
+                reply=generate_natural_response(result),
+                function_called=function_names[0],
+                success=result.get("success", True)
+            )
+        
+        results = await asyncio.gather(*tasks)
         
         # Step 4: Generate Response
         # If multiple actions, we might want to synthesize a combined response
@@ -147,20 +347,14 @@ async def kuro_endpoint(request: KuroRequest):
         # Correction: Let's combine the outputs if possible, or just pick the last one.
         # Better approach: Pass a synthetic result combining them.
         
-        if len(results) == 1:
-            final_result = results[0]
-        else:
-            final_result = {
-                "success": all(r.get("success", False) for r in results),
-                "output": "\n".join([str(r.get("output", "")) for r in results]),
-                "function": "multi_action"
-            }
+        final_result = {
+            "success": all(r.get("success", False) for r in results),
+            "output": "\n".join([str(r.get("output", "")) for r in results]),
+            "function": "multi_action"
+        }
         
         reply = generate_natural_response(final_result)
         
-        print(colored(f"🤖 KURO: {reply}", "green", attrs=["bold"]))
-        print(colored("=" * 60, "cyan"))
-        
         return KuroResponse(
             reply=reply,
             function_called=",".join(function_names),
@@ -169,8 +363,7 @@ async def kuro_endpoint(request: KuroRequest):
         
     except Exception as e:
         error_msg = str(e)
-        print(colored(f"❌ ERROR: {error_msg}", "red"))
-        print(colored(f"Error type: {type(e).__name__}", "red"))
+        log.error("❌ ERROR (%s): %s", type(e).__name__, error_msg)
         
         reply_msg = "Sorry, I'm having trouble processing that right now. Can you try again?"
         
@@ -185,32 +378,79 @@ async def kuro_endpoint(request: KuroRequest):
             success=False
         )
 
+# Batch Endpoint (non-interactive workloads, discounted Batch API)
+@app.post("/kuro/batch")
+async def kuro_batch_endpoint(request: BatchRequest):
+    """Submit messages for offline decision-making via the Gemini Batch API"""
+    messages = [m.strip() for m in request.messages if m.strip()]
+    if not messages:
+        raise HTTPException(status_code=400, detail="Messages cannot be empty")
+    
+    return await asyncio.to_thread(submit_batch, messages)
+
+@app.get("/kuro/batch/{job_name:path}")
+async def kuro_batch_status(job_name: str):
+    """Check the state of a submitted batch job"""
+    return await asyncio.to_thread(get_batch_status, job_name)
+
 @app.post("/tts")
-async def tts_endpoint(request: TTSRequest):
+async def tts_endpoint(request: TTSRequest, background: BackgroundTasks):
     """Generate audio from text using Groq TTS"""
-    if not request.text:
-        raise HTTPException(status_code=400, detail="Text is required")
-    
     try:
-        audio_buffer = tts_engine.generate_audio(request.text)
-        if not audio_buffer:
+        audio_path = await tts_engine.cached_audio_file(request.text)
+        if audio_path:
+            # Streamed from disk in chunks rather than buffered into the response
+            return FileResponse(audio_path, media_type="audio/wav", headers={"Cache-Control": "public, max-age=3600"})
+        
+        # Cache miss - relay Groq's chunks as they arrive (and cache the result)
+        stream = await tts_engine.stream_audio(request.text)
+        if stream is None:
              raise HTTPException(status_code=500, detail="Failed to generate audio")
-             
-        # Return as streaming response or direct bytes
-        return Response(content=audio_buffer.read(), media_type="audio/wav")
+        audio, release = stream
+        background.add_task(release)  # Frees the pending entry even if the body is never read
+        return StreamingResponse(audio, media_type="audio/wav", headers={"Cache-Control": "public, max-age=3600"})
+    except HTTPException:
+        raise
     except Exception as e:
-        print(colored(f"❌ TTS Error: {e}", "red"))
+        log.error("❌ TTS Error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 # Tools Info Endpoint
+# /tools body is static - encode it once instead of per request
+_TOOLS_BODY = b'{"available_tools":' + AVAILABLE_TOOLS_JSON + b"}"
+
 @app.get("/tools")
 async def get_tools():
     """Return available tools/functions"""
+    return Response(content=_TOOLS_BODY, media_type="application/json")
+
+# Cache Stats Endpoint
+@app.get("/debug/cache")
+async def debug_cache():
+    """Return embedding cache, local router and response cache statistics"""
+    info = embed_query.cache_info()
     return {
-        "available_tools": AVAILABLE_TOOLS
+        "embedding_cache": {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "maxsize": info.maxsize
+        },
+        "local_router": router_stats(),
+        "response_cache": {
+            **_response_cache_stats,
+            "size": len(_response_cache),
+            "maxsize": RESPONSE_CACHE_MAXSIZE
+        }
     }
 
 # Run with: uvicorn main:app --reload
+# Multi-worker: KURO_WORKERS=4 python main.py
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Caches, request coalescing and focus-dependent ordering are per process,
+    # so extra workers are opt-in (KURO_WORKERS=0 means one per CPU)
+    workers = int(os.getenv("KURO_WORKERS", "1")) or os.cpu_count()
+    # loop="auto" picks uvloop where available (it doesn't support Windows)
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=workers,
+                loop="auto", http="httptools", lifespan="on")
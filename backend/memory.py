@@ -4,37 +4,57 @@ Handles embedding generation and memory storage/retrieval
 """
 
 import os
-from typing import List, Dict, Any
+import logging
+import asyncio
+import hashlib
+import threading
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 from pinecone import Pinecone, ServerlessSpec
-import google.generativeai as genai
-from termcolor import colored
+from embeddings import embed_query, embed_text
+from semantic_cache import SemanticCache
+
+log = logging.getLogger("kuro.memory")
 
 # Initialize Pinecone
 pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
 INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "kuro-memory")
+_INDEX = None  # Index handle, set once by init_pinecone()
+
+# Max memories formatted into the prompt - every context_str has at most this many lines
+TOP_K = 3
+
+# Semantic query cache - a query close enough to a recent one reuses its
+# Pinecone results. Cleared whenever memories are written or deleted.
+QUERY_CACHE_THRESHOLD = 0.92
+QUERY_CACHE_TTL = 6 * 3600  # seconds
+QUERY_CACHE_MAXSIZE = 2048
+_query_cache = SemanticCache(QUERY_CACHE_MAXSIZE, QUERY_CACHE_THRESHOLD, ttl=QUERY_CACHE_TTL)
 
-# Initialize Gemini for embeddings
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+# Upsert batching - saves are buffered and flushed by a background task every
+# UPSERT_FLUSH_INTERVAL seconds, at most UPSERT_BATCH_SIZE vectors per RPC
+UPSERT_BATCH_SIZE = 100  # Pinecone's per-request limit
+UPSERT_FLUSH_INTERVAL = 0.2  # seconds
+_upsert_buffer: List[Tuple[str, List[float], Dict[str, Any]]] = []
+_upsert_lock = threading.Lock()
+_flush_task: Optional[asyncio.Task] = None
+
+# Gemini is configured (and embeddings batched) in embeddings.py
 
 def get_embedding(text: str) -> List[float]:
     """Generate embedding using Google's text-embedding-004 model (768 dimensions)"""
-    try:
-        result = genai.embed_content(
-            model="models/text-embedding-004",
-            content=text,
-            task_type="retrieval_document"
-        )
-        return result['embedding']
-    except Exception as e:
-        print(colored(f"❌ Embedding Error: {e}", "red"))
-        return [0.0] * 768  # Return zero vector on error
+    # Batched with concurrent embeds; zero vector on error
+    return list(embed_text(text))
 
 def init_pinecone():
-    """Initialize Pinecone index if it doesn't exist"""
+    """Initialize Pinecone index if it doesn't exist (idempotent - safe to call per worker)"""
+    global _INDEX
+    if _INDEX is not None:
+        return _INDEX
+    
     try:
         if INDEX_NAME not in pc.list_indexes().names():
-            print(colored(f"🔧 Creating Pinecone index: {INDEX_NAME}", "yellow"))
+            log.warning("🔧 Creating Pinecone index: %s", INDEX_NAME)
             pc.create_index(
                 name=INDEX_NAME,
                 dimension=768,
@@ -44,83 +64,167 @@ def init_pinecone():
                     region=os.getenv("PINECONE_ENV", "us-east-1")
                 )
             )
-        print(colored(f"✅ Pinecone index ready: {INDEX_NAME}", "green"))
-        return pc.Index(INDEX_NAME)
+        _INDEX = pc.Index(INDEX_NAME)
+        log.info("✅ Pinecone index ready: %s", INDEX_NAME)
+        return _INDEX
     except Exception as e:
-        print(colored(f"❌ Pinecone Init Error: {e}", "red"))
+        log.error("❌ Pinecone Init Error: %s", e)
         return None
 
+def get_index():
+    """Shared index handle - initialized lazily if startup didn't get to it"""
+    if _INDEX is not None:
+        return _INDEX
+    return init_pinecone() or pc.Index(INDEX_NAME)
+
+def prewarm_index() -> None:
+    """Open the index connection before the first request needs it"""
+    get_index().describe_index_stats()
+
 def upsert_memory(text: str, metadata: Dict[str, Any]) -> bool:
     """Store memory in Pinecone with metadata"""
     try:
-        index = pc.Index(INDEX_NAME)
         embedding = get_embedding(text)
         
-        # Generate unique ID based on timestamp
-        memory_id = f"mem_{int(datetime.now().timestamp() * 1000)}"
+        # ID derived from the content - saving the same text again overwrites
+        # the old entry instead of accumulating duplicates, and retries are idempotent
+        memory_id = f"mem_{hashlib.sha256(text.encode('utf-8')).hexdigest()[:24]}"
         
         # Add timestamp to metadata
         metadata["timestamp"] = datetime.now().isoformat()
         metadata["content"] = text
         
-        # Upsert to Pinecone
-        index.upsert(vectors=[(memory_id, embedding, metadata)])
+        # Upsert to Pinecone - buffered for the next flush when the flusher runs
+        vector = (memory_id, embedding, metadata)
+        if _flush_task is not None and not _flush_task.done():
+            with _upsert_lock:
+                _upsert_buffer.append(vector)
+        else:
+            get_index().upsert(vectors=[vector])
+            _query_cache.clear()  # Cached query results may now be missing this memory
         
-        print(colored(f"💾 Memory saved: {text[:50]}...", "cyan"))
+        log.info("💾 Memory saved: %.50s...", text)
         return True
     except Exception as e:
-        print(colored(f"❌ Memory Save Error: {e}", "red"))
+        log.error("❌ Memory Save Error: %s", e)
         return False
 
-def retrieve_context(query: str, top_k: int = 3) -> List[Dict[str, Any]]:
-    """Retrieve relevant memories from Pinecone"""
+def flush_upserts() -> int:
+    """Write all buffered memories now; returns how many were written"""
+    with _upsert_lock:
+        # Last write wins for a memory saved twice within one interval
+        pending = list({vector[0]: vector for vector in _upsert_buffer}.values())
+        _upsert_buffer.clear()
+    if not pending:
+        return 0
+    
+    index = get_index()
+    for i in range(0, len(pending), UPSERT_BATCH_SIZE):
+        try:
+            index.upsert(vectors=pending[i:i + UPSERT_BATCH_SIZE])
+        except Exception:
+            with _upsert_lock:
+                _upsert_buffer[:0] = pending[i:]  # Retry on the next flush
+            raise
+        finally:
+            _query_cache.clear()  # Cached query results may now be missing these memories
+    return len(pending)
+
+async def _flush_loop() -> None:
+    while True:
+        await asyncio.sleep(UPSERT_FLUSH_INTERVAL)
+        if not _upsert_buffer:
+            continue
+        try:
+            count = await asyncio.to_thread(flush_upserts)
+            log.debug("💾 Flushed %d memories", count)
+        except Exception as e:
+            log.error("❌ Memory Flush Error: %s", e)
+
+def start_upsert_flusher() -> None:
+    """Start the background flush task on the running event loop (idempotent)"""
+    global _flush_task
+    if _flush_task is not None and not _flush_task.done():
+        return
+    _flush_task = asyncio.get_running_loop().create_task(_flush_loop())
+
+def _query_memories(query_embedding: List[float], top_k: int) -> Tuple[List[Dict[str, Any]], str]:
+    """
+    Query Pinecone with a precomputed embedding.
+    Returns (memories, context_str) where memories has at most top_k entries and
+    context_str is the prompt-ready bullet list of at most TOP_K of them.
+    """
+    cached = _query_cache.search(query_embedding)
+    if cached is not None:
+        (cached_top_k, memories, context_str), _ = cached
+        if cached_top_k >= top_k:
+            return memories[:top_k], context_str
+    
+    index = get_index()
+    
+    # Query Pinecone
+    results = index.query(
+        vector=query_embedding,
+        top_k=top_k,
+        include_metadata=True
+    )
+    
+    # Extract matches (formatted for the prompt in the same pass)
+    memories = []
+    lines = []
+    for match in results.matches[:top_k]:
+        content = match.metadata.get("content", "")
+        memories.append({
+            "content": content,
+            "score": match.score,
+            "metadata": match.metadata
+        })
+        lines.append(f"- {content}")
+    
+    if memories:
+        log.debug("🧠 Retrieved %d memories", len(memories))
+    
+    context_str = "\n".join(lines[:TOP_K])
+    _query_cache.put(str(hash(tuple(query_embedding))), query_embedding, (top_k, memories, context_str))
+    return memories, context_str
+
+def retrieve_context(query: str, top_k: int = TOP_K) -> Tuple[List[Dict[str, Any]], str]:
+    """Retrieve relevant memories from Pinecone as (memories, context_str)"""
     try:
-        index = pc.Index(INDEX_NAME)
-        query_embedding = get_embedding(query)
-        
-        # Query Pinecone
-        results = index.query(
-            vector=query_embedding,
-            top_k=top_k,
-            include_metadata=True
-        )
-        
-        # Extract matches
-        memories = []
-        for match in results.matches:
-            memories.append({
-                "content": match.metadata.get("content", ""),
-                "score": match.score,
-                "metadata": match.metadata
-            })
-        
-        if memories:
-            print(colored(f"🧠 Retrieved {len(memories)} memories", "magenta"))
-        
-        return memories
+        query_embedding = list(embed_query(query))
+        return _query_memories(query_embedding, top_k)
     except Exception as e:
-        print(colored(f"❌ Memory Retrieval Error: {e}", "red"))
-        return []
+        log.error("❌ Memory Retrieval Error: %s", e)
+        return [], ""
+
+async def retrieve_context_async(query_embedding: List[float], top_k: int = TOP_K) -> Tuple[List[Dict[str, Any]], str]:
+    """Retrieve relevant memories for an already-embedded query without blocking the event loop"""
+    try:
+        return await asyncio.to_thread(_query_memories, list(query_embedding), top_k)
+    except Exception as e:
+        log.error("❌ Memory Retrieval Error: %s", e)
+        return [], ""
 
 def list_all_memories(limit: int = 10) -> List[Dict[str, Any]]:
     """List recent memories (for debugging/admin)"""
     try:
-        index = pc.Index(INDEX_NAME)
+        index = get_index()
         # Note: Pinecone doesn't have a direct "list all" - this is a placeholder
         # In production, you'd maintain a separate metadata store
-        print(colored("⚠️ List all memories not fully implemented", "yellow"))
+        log.warning("⚠️ List all memories not fully implemented")
         return []
     except Exception as e:
-        print(colored(f"❌ List Memories Error: {e}", "red"))
+        log.error("❌ List Memories Error: %s", e)
         return []
 
 def delete_memory(memory_id: str) -> bool:
     """Delete a specific memory"""
     try:
-        index = pc.Index(INDEX_NAME)
+        index = get_index()
         index.delete(ids=[memory_id])
-        print(colored(f"🗑️ Memory deleted: {memory_id}", "yellow"))
+        _query_cache.clear()
+        log.info("🗑️ Memory deleted: %s", memory_id)
         return True
     except Exception as e:
-        print(colored(f"❌ Delete Memory Error: {e}", "red"))
+        log.error("❌ Delete Memory Error: %s", e)
         return False
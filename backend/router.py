@@ -0,0 +1,206 @@
+"""
+Router Module - Local Intent Classifier
+Routes trivially-classifiable commands without a Gemini round-trip
+"""
+
+import os
+import re
+import logging
+from typing import Dict, Any, List, Optional, Tuple, Callable
+import numpy as np
+from embeddings import embed_query
+
+log = logging.getLogger("kuro.router")
+
+# Cascading router: local nearest-example match first, Gemini only when unsure
+# Disable with KURO_LOCAL_ROUTER=0
+LOCAL_ROUTER_ENABLED = os.getenv("KURO_LOCAL_ROUTER", "1") == "1"
+ROUTER_THRESHOLD = 0.82
+
+# (utterance, canonical decision) pairs mirroring the SYSTEM_PROMPT examples
+ROUTING_EXAMPLES: List[Tuple[str, Dict[str, Any]]] = [
+    ("take a screenshot", {"function": "take_screenshot", "arguments": {}}),
+    ("screenshot", {"function": "take_screenshot", "arguments": {}}),
+    ("capture my screen", {"function": "take_screenshot", "arguments": {}}),
+    ("tell me a joke", {"function": "tell_joke", "arguments": {}}),
+    ("make me laugh", {"function": "tell_joke", "arguments": {}}),
+    ("volume up", {"function": "volume_control", "arguments": {"action": "up"}}),
+    ("turn it up", {"function": "volume_control", "arguments": {"action": "up"}}),
+    ("volume down", {"function": "volume_control", "arguments": {"action": "down"}}),
+    ("mute the volume", {"function": "volume_control", "arguments": {"action": "mute"}}),
+    ("unmute", {"function": "volume_control", "arguments": {"action": "unmute"}}),
+    ("set volume to 50%", {"function": "volume_control", "arguments": {"action": "set", "level": 50}}),
+    ("brightness 50%", {"function": "brightness_control", "arguments": {"action": "set", "level": 50}}),
+    ("dim the screen", {"function": "brightness_control", "arguments": {"action": "down"}}),
+    ("increase brightness", {"function": "brightness_control", "arguments": {"action": "up"}}),
+    ("minimize this window", {"function": "window_ops", "arguments": {"action": "minimize"}}),
+    ("maximize the window", {"function": "window_ops", "arguments": {"action": "maximize"}}),
+    ("close this app", {"function": "window_ops", "arguments": {"action": "close"}}),
+    ("switch window", {"function": "window_ops", "arguments": {"action": "switch"}}),
+    ("check battery status", {"function": "system_info", "arguments": {"info_type": "battery"}}),
+    ("how much ram am i using", {"function": "system_info", "arguments": {"info_type": "memory"}}),
+    ("cpu usage", {"function": "system_info", "arguments": {"info_type": "cpu"}}),
+    ("open notepad", {"function": "open_app", "arguments": {"app_name": "notepad"}}),
+    ("launch vs code", {"function": "open_app", "arguments": {"app_name": "vscode"}}),
+    ("open spotify", {"function": "open_app", "arguments": {"app_name": "spotify"}}),
+]
+
+# Argument Extractors - fill arguments from the actual message.
+# Returning None means "can't tell" and the message escalates to Gemini.
+_LEVEL_RE = re.compile(r"\b(\d{1,3})\s*%?")
+_TO_LEVEL_RE = re.compile(r"\b(?:to|at)\s+(\d{1,3})\s*%?")
+_NUMBER_RE = re.compile(r"\d")
+# A bare number next to these is an amount or a duration, not a target level
+# ("volume up by 20%", "mute for 5 minutes") - Gemini decides those
+_NOT_A_LEVEL_RE = re.compile(
+    r"\b(?:up|down|increase|decrease|raise|lower|reduce|louder|quieter|dim|brighter|darker"
+    r"|by|mute|unmute|for|seconds?|minutes?|hours?)\b"
+)
+_MULTI_STEP_RE = re.compile(r"\b(?:and|then|also)\b|[,;]", re.IGNORECASE)
+_OPEN_RE = re.compile(r"^(?:please\s+)?(?:open|launch|start|run)\s+(?:the\s+)?(.+?)(?:\s+app)?[.!]?$", re.IGNORECASE)
+
+def _level(message: str) -> Optional[int]:
+    """Target level in message - after "to"/"at", or a bare number with no relative wording"""
+    match = _TO_LEVEL_RE.search(message)
+    if match is None and not _NOT_A_LEVEL_RE.search(message):
+        match = _LEVEL_RE.search(message)
+    if match and 0 <= int(match.group(1)) <= 100:
+        return int(match.group(1))
+    return None
+
+def _no_args(message: str) -> Optional[Dict[str, Any]]:
+    return {}
+
+def _volume_args(message: str) -> Optional[Dict[str, Any]]:
+    text = message.lower()
+    level = _level(text)
+    if level is not None:
+        return {"action": "set", "level": level}
+    if _NUMBER_RE.search(text):
+        return None  # Relative amount or duration
+    if "unmute" in text:
+        return {"action": "unmute"}
+    if "mute" in text:
+        return {"action": "mute"}
+    if any(w in text for w in ("up", "louder", "increase", "raise")):
+        return {"action": "up"}
+    if any(w in text for w in ("down", "quieter", "lower", "decrease", "reduce")):
+        return {"action": "down"}
+    return None
+
+def _brightness_args(message: str) -> Optional[Dict[str, Any]]:
+    text = message.lower()
+    level = _level(text)
+    if level is not None:
+        return {"action": "set", "level": level}
+    if _NUMBER_RE.search(text):
+        return None  # Relative amount or duration
+    if any(w in text for w in ("dim", "down", "lower", "decrease", "reduce", "darker")):
+        return {"action": "down"}
+    if any(w in text for w in ("up", "brighter", "increase", "raise")):
+        return {"action": "up"}
+    return None
+
+def _window_args(message: str) -> Optional[Dict[str, Any]]:
+    text = message.lower()
+    for action in ("minimize", "maximize", "close", "switch"):
+        if action in text:
+            return {"action": action}
+    return None
+
+def _system_info_args(message: str) -> Optional[Dict[str, Any]]:
+    text = message.lower()
+    if "battery" in text:
+        return {"info_type": "battery"}
+    if "cpu" in text or "processor" in text:
+        return {"info_type": "cpu"}
+    if "ram" in text or "memory" in text:
+        return {"info_type": "memory"}
+    if "disk" in text or "storage" in text:
+        return {"info_type": "disk"}
+    return {"info_type": "all"}
+
+def _open_app_args(message: str) -> Optional[Dict[str, Any]]:
+    match = _OPEN_RE.match(message.strip())
+    if not match:
+        return None
+    return {"app_name": match.group(1).strip()}
+
+# Only functions listed here are ever routed locally
+_EXTRACTORS: Dict[str, Callable[[str], Optional[Dict[str, Any]]]] = {
+    "take_screenshot": _no_args,
+    "tell_joke": _no_args,
+    "volume_control": _volume_args,
+    "brightness_control": _brightness_args,
+    "window_ops": _window_args,
+    "system_info": _system_info_args,
+    "open_app": _open_app_args,
+}
+
+# Example index (unit-normalized embeddings), built lazily on first use
+_index: Optional[np.ndarray] = None
+_index_functions: List[str] = []
+_stats = {"hits": 0, "misses": 0}
+
+def _build_index() -> None:
+    global _index, _index_functions
+    
+    vectors, functions = [], []
+    for utterance, decision in ROUTING_EXAMPLES:
+        vec = np.asarray(embed_query(utterance), dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        if norm == 0:
+            continue  # Embedding failed - skip this example
+        vectors.append(vec / norm)
+        functions.append(decision["function"])
+    
+    if vectors:
+        _index = np.vstack(vectors)
+        _index_functions = functions
+        log.info("✅ Local router ready (%d examples)", len(functions))
+
+def prewarm_router() -> None:
+    """Build the example index now instead of on the first routed message"""
+    if LOCAL_ROUTER_ENABLED and _index is None:
+        _build_index()
+
+def route_locally(message: str) -> Optional[Dict[str, Any]]:
+    """
+    Return a decision for the message if the local classifier is confident,
+    otherwise None (escalate to Gemini).
+    """
+    # Chained commands ("open spotify and set volume to 30%") need Gemini
+    if not LOCAL_ROUTER_ENABLED or _MULTI_STEP_RE.search(message):
+        return None
+    
+    if _index is None:
+        _build_index()
+        if _index is None:
+            return None
+    
+    query = np.asarray(embed_query(message), dtype=np.float32)
+    norm = np.linalg.norm(query)
+    if norm == 0:
+        return None
+    
+    scores = _index @ (query / norm)
+    best = int(np.argmax(scores))
+    function_name = _index_functions[best]
+    
+    arguments = _EXTRACTORS[function_name](message) if scores[best] >= ROUTER_THRESHOLD else None
+    if arguments is None:
+        _stats["misses"] += 1
+        return None
+    
+    _stats["hits"] += 1
+    log.debug("⚡ Routed locally: %s (score %.2f)", function_name, scores[best])
+    return {"function": function_name, "arguments": arguments}
+
+def router_stats() -> Dict[str, Any]:
+    """Hit/miss counters for /debug/cache"""
+    total = _stats["hits"] + _stats["misses"]
+    return {
+        "hits": _stats["hits"],
+        "misses": _stats["misses"],
+        "hit_rate": round(_stats["hits"] / total, 3) if total else 0.0
+    }
@@ -0,0 +1,117 @@
+"""
+Semantic Cache Module - In-RAM Vector Cache
+Fixed-capacity LRU of embedding -> value, matched by cosine similarity
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, List, Optional, Sequence, Tuple
+import numpy as np
+from embeddings import EMBEDDING_DIM
+
+def quantize_int8(vector: Sequence[float]) -> Tuple[np.ndarray, float]:
+    """
+    Scalar-quantize (SQ8) a vector after unit-normalizing it.
+    Returns (int8 vector, scale) with vector ≈ q * scale.
+    """
+    v = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(v)
+    if norm == 0:
+        return np.zeros(v.shape, dtype=np.int8), 0.0
+    v = v / norm
+    scale = float(np.abs(v).max()) / 127.0
+    return np.round(v / scale).astype(np.int8), scale
+
+class SemanticCache:
+    """
+    LRU cache whose entries can be found by exact key or by embedding.
+    Vectors are stored as int8 with a per-vector scale (4x less RAM and
+    bandwidth than fp32); similarity is the int8 dot product rescaled.
+    Entries older than ttl seconds (if set) are treated as misses.
+    """
+    
+    def __init__(self, capacity: int, threshold: float, dim: int = EMBEDDING_DIM, ttl: Optional[float] = None):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl = ttl
+        self._lock = threading.Lock()  # Used from worker threads
+        self._stamps = np.zeros(capacity, dtype=np.float64)
+        self._vectors = np.zeros((capacity, dim), dtype=np.int8)
+        self._scales = np.zeros(capacity, dtype=np.float32)
+        self._values: List[Any] = [None] * capacity
+        self._rows: "OrderedDict[str, int]" = OrderedDict()  # key -> row, in LRU order
+        self._row_keys: List[Optional[str]] = [None] * capacity
+    
+    def __len__(self) -> int:
+        return len(self._rows)
+    
+    def _expired(self, row: int) -> bool:
+        return self.ttl is not None and time.monotonic() - self._stamps[row] > self.ttl
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Exact-key lookup"""
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None or self._expired(row):
+                return None
+            self._rows.move_to_end(key)
+            return self._values[row]
+    
+    def search(self, embedding: Sequence[float]) -> Optional[Tuple[Any, float]]:
+        """Return (value, score) of the most similar entry above threshold"""
+        q, q_scale = quantize_int8(embedding)
+        if q_scale == 0:
+            return None
+        
+        with self._lock:
+            n = len(self._rows)
+            if n == 0:
+                return None
+            
+            # Rows 0..n-1 are always occupied (eviction reuses rows in place)
+            # int8 x float32 matvec runs on BLAS; exact since |dot| <= 768 * 127^2 < 2^24
+            dots = self._vectors[:n] @ q.astype(np.float32)
+            scores = dots * self._scales[:n] * q_scale
+            if self.ttl is not None:
+                scores[self._stamps[:n] < time.monotonic() - self.ttl] = -np.inf
+            row = int(np.argmax(scores))
+            score = float(scores[row])
+            if score < self.threshold:
+                return None
+            
+            self._rows.move_to_end(self._row_keys[row])
+            return self._values[row], score
+    
+    def put(self, key: str, embedding: Optional[Sequence[float]], value: Any) -> None:
+        """Insert or refresh an entry, evicting the least recently used when full"""
+        with self._lock:
+            self._put(key, embedding, value)
+    
+    def clear(self) -> None:
+        """Drop every entry (e.g. when the cached data changes)"""
+        with self._lock:
+            self._rows.clear()
+            self._values = [None] * self.capacity
+            self._row_keys = [None] * self.capacity
+    
+    def _put(self, key: str, embedding: Optional[Sequence[float]], value: Any) -> None:
+        row = self._rows.get(key)
+        if row is None:
+            if len(self._rows) >= self.capacity:
+                _, row = self._rows.popitem(last=False)
+            else:
+                row = len(self._rows)
+        
+        if embedding is not None:
+            self._vectors[row], self._scales[row] = quantize_int8(embedding)
+        else:
+            # Exact-key only: a zero scale never passes the similarity threshold
+            self._vectors[row] = 0
+            self._scales[row] = 0.0
+        
+        self._values[row] = value
+        self._row_keys[row] = key
+        self._stamps[row] = time.monotonic()
+        self._rows[key] = row
+        self._rows.move_to_end(key)
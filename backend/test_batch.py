@@ -0,0 +1,34 @@
+"""
+Unit tests for the batch module
+Run with: python -m unittest test_batch
+"""
+
+import os
+import json
+import tempfile
+import unittest
+
+# brain/memory configure their clients at import; no calls are made here
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+os.environ.setdefault("PINECONE_API_KEY", "test")
+
+import brain
+import batch
+
+class WriteBatchFileTest(unittest.TestCase):
+    def test_serializes_after_models_are_built(self):
+        brain.reload_model()  # Builds GenerativeModels from TOOL_CONFIG again
+        with tempfile.TemporaryDirectory() as tmp:
+            path = batch.write_batch_file(["open chrome", "hello"], os.path.join(tmp, "requests.jsonl"))
+            with open(path, encoding="utf-8") as f:
+                lines = [json.loads(line) for line in f]
+
+        self.assertEqual([line["key"] for line in lines], ["request-0", "request-1"])
+        self.assertEqual(lines[0]["request"]["tool_config"], {"function_calling_config": {"mode": "ANY"}})
+
+    def test_tool_config_left_as_plain_dicts(self):
+        brain.reload_model()
+        self.assertIsInstance(brain.TOOL_CONFIG["function_calling_config"], dict)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+"""
+Unit tests for the local router's argument extractors
+Run with: python -m unittest test_router
+"""
+
+import unittest
+
+import router
+
+class VolumeArgsTest(unittest.TestCase):
+    def test_absolute_level(self):
+        self.assertEqual(router._volume_args("set volume to 50%"), {"action": "set", "level": 50})
+        self.assertEqual(router._volume_args("volume 30"), {"action": "set", "level": 30})
+        self.assertEqual(router._volume_args("turn the volume up to 80"), {"action": "set", "level": 80})
+
+    def test_relative_amount_escalates(self):
+        self.assertIsNone(router._volume_args("turn volume up by 20%"))
+        self.assertIsNone(router._volume_args("lower the volume 10"))
+
+    def test_duration_escalates(self):
+        self.assertIsNone(router._volume_args("mute for 5 minutes"))
+
+    def test_out_of_range_escalates(self):
+        self.assertIsNone(router._volume_args("set volume to 150"))
+
+    def test_keywords(self):
+        self.assertEqual(router._volume_args("volume up"), {"action": "up"})
+        self.assertEqual(router._volume_args("make it quieter"), {"action": "down"})
+        self.assertEqual(router._volume_args("mute the volume"), {"action": "mute"})
+        self.assertEqual(router._volume_args("unmute"), {"action": "unmute"})
+        self.assertIsNone(router._volume_args("volume"))
+
+class BrightnessArgsTest(unittest.TestCase):
+    def test_absolute_level(self):
+        self.assertEqual(router._brightness_args("brightness 50%"), {"action": "set", "level": 50})
+        self.assertEqual(router._brightness_args("dim the screen to 20"), {"action": "set", "level": 20})
+
+    def test_relative_amount_escalates(self):
+        self.assertIsNone(router._brightness_args("lower brightness 10"))
+        self.assertIsNone(router._brightness_args("increase brightness by 15%"))
+
+    def test_keywords(self):
+        self.assertEqual(router._brightness_args("dim the screen"), {"action": "down"})
+        self.assertEqual(router._brightness_args("increase brightness"), {"action": "up"})
+
+class WindowArgsTest(unittest.TestCase):
+    def test_actions(self):
+        self.assertEqual(router._window_args("minimize this window"), {"action": "minimize"})
+        self.assertEqual(router._window_args("switch window"), {"action": "switch"})
+        self.assertIsNone(router._window_args("what window is this"))
+
+class SystemInfoArgsTest(unittest.TestCase):
+    def test_info_types(self):
+        self.assertEqual(router._system_info_args("check battery status"), {"info_type": "battery"})
+        self.assertEqual(router._system_info_args("cpu usage"), {"info_type": "cpu"})
+        self.assertEqual(router._system_info_args("how much ram am i using"), {"info_type": "memory"})
+        self.assertEqual(router._system_info_args("how much disk space is left"), {"info_type": "disk"})
+        self.assertEqual(router._system_info_args("system status"), {"info_type": "all"})
+
+class OpenAppArgsTest(unittest.TestCase):
+    def test_app_name(self):
+        self.assertEqual(router._open_app_args("open notepad"), {"app_name": "notepad"})
+        self.assertEqual(router._open_app_args("please launch the spotify app"), {"app_name": "spotify"})
+        self.assertIsNone(router._open_app_args("what apps are open"))
+
+class MultiStepTest(unittest.TestCase):
+    def test_chained_commands_escalate(self):
+        self.assertIsNone(router.route_locally("open spotify and set volume to 30%"))
+
+if __name__ == "__main__":
+    unittest.main()
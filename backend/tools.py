@@ -5,10 +5,167 @@ Defines all executable functions that Kuro can call
 
 import subprocess
 import os
-from typing import Dict, Any
-from termcolor import colored
+import sys
+import logging
+import asyncio
+import locale
+import threading
+import time
+import re
+import shlex
+import shutil
+import functools
+import inspect
+import random
+import webbrowser
+import urllib.parse
+import orjson
+import ctypes
+from ctypes import cast, POINTER
+from typing import Dict, Any, List, Optional, Tuple, Union
 from memory import upsert_memory, retrieve_context
 
+log = logging.getLogger("kuro.tools")
+
+# Optional / platform-specific dependencies - tools report themselves
+# unavailable instead of failing at import (pyautogui raises more than
+# ImportError without a display; pycaw/comtypes are Windows-only)
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import pyautogui
+except Exception:
+    pyautogui = None
+
+try:
+    import pyperclip
+except ImportError:
+    pyperclip = None
+
+try:
+    import mss
+    import mss.tools
+except ImportError:
+    mss = None
+
+try:
+    from comtypes import CoInitializeEx, COINIT_MULTITHREADED, CLSCTX_ALL
+    from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
+except Exception:
+    AudioUtilities = None
+
+try:
+    import screen_brightness_control as sbc
+except Exception:
+    sbc = None
+
+_JOKES = (
+    "Why don't programmers like nature? It has too many bugs!",
+    "Why do Java developers wear glasses? Because they don't C#!",
+    "How many programmers does it take to change a light bulb? None, that's a hardware problem!"
+)
+
+# Patterns that get a shell command refused - one case-insensitive pass; \s+
+# also catches padded variants like "rm  -rf"
+_HARMFUL_RE = re.compile(r"rm\s+-rf|format|del\s+/s\s+/q|rd\s+/s\s+/q|mkfs|dd\s+if=", re.IGNORECASE)
+
+# Anything a shell would interpret (pipes, redirects, variables, globs, chaining)
+_SHELL_SYNTAX_RE = re.compile(r"[|&;<>()$`*?~%^!\n]")
+
+# PATH lookups are a directory scan per call; commands repeat, so remember them
+_which = functools.lru_cache(maxsize=256)(shutil.which)
+
+def _direct_argv(command: str) -> Optional[Union[List[str], str]]:
+    """
+    What to hand Popen to run command without a shell, or None if it needs one
+    (shell syntax, or a builtin like dir/echo that isn't on PATH).
+    POSIX gets an argv list. Windows gets the original command line with only
+    the executable resolved - programs parse their own arguments there, and
+    re-quoting shlex's tokens would pass literal quote characters through.
+    """
+    if _SHELL_SYNTAX_RE.search(command):
+        return None
+    command = command.strip()
+    try:
+        argv = shlex.split(command, posix=(os.name != "nt"))
+    except ValueError:
+        return None
+    if not argv:
+        return None
+    executable = _which(argv[0].strip('"') if os.name == "nt" else argv[0])
+    if executable is None:
+        return None
+    if os.name == "nt":
+        # posix=False tokens are verbatim, so argv[0] is a prefix of the command
+        return subprocess.list2cmdline([executable]) + command[len(argv[0]):]
+    argv[0] = executable  # Resolved once - Popen doesn't search PATH again
+    return argv
+
+_SEARCH_URL = "https://www.google.com/search?q="
+
+# Friendly app names -> executable / shell command
+_APP_MAP = {
+    "notepad": "notepad.exe", "calculator": "calc.exe", "calc": "calc.exe",
+    "explorer": "explorer.exe", "paint": "mspaint.exe", "cmd": "cmd.exe",
+    "terminal": "cmd.exe", "powershell": "powershell.exe",
+    "settings": "start ms-settings:", "control panel": "control.exe",
+    "spotify": "start spotify:", "vscode": "code", "word": "start winword",
+    "excel": "start excel", "powerpoint": "start powerpnt", "chrome": "start chrome",
+    "browser": "start chrome"
+}
+
+# Only this much command output is kept; the rest is drained and discarded
+COMMAND_OUTPUT_LIMIT = 4096  # bytes
+COMMAND_TIMEOUT = 10  # seconds
+
+def _read_bounded(pipe) -> bytes:
+    """First COMMAND_OUTPUT_LIMIT bytes of pipe, draining the rest so the child never blocks"""
+    raw = pipe.read(COMMAND_OUTPUT_LIMIT)
+    while pipe.read(65536):
+        pass
+    pipe.close()
+    return raw
+
+def _decode_output(raw: bytes) -> str:
+    # Same codec text=True would use, without decoding the discarded tail
+    return raw.decode(locale.getpreferredencoding(False), "replace").replace("\r\n", "\n").strip()
+
+def _run_bounded(command, shell: bool = False) -> Tuple[str, str]:
+    """Run a command, keeping at most COMMAND_OUTPUT_LIMIT bytes of stdout and of stderr.
+
+    The remainder is read and dropped rather than killing the process, so
+    chatty commands still run to completion (within COMMAND_TIMEOUT).
+    """
+    proc = subprocess.Popen(command, shell=shell, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    timed_out = threading.Event()
+
+    def _kill():
+        timed_out.set()
+        proc.kill()
+
+    # stderr is drained on its own thread so neither pipe can fill up and stall the child
+    err = {}
+    err_reader = threading.Thread(target=lambda: err.setdefault("raw", _read_bounded(proc.stderr)), daemon=True)
+    timer = threading.Timer(COMMAND_TIMEOUT, _kill)
+    timer.start()
+    err_reader.start()
+    try:
+        raw = _read_bounded(proc.stdout)
+        err_reader.join()
+        proc.wait()
+    finally:
+        timer.cancel()
+
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(command, COMMAND_TIMEOUT)
+    return _decode_output(raw), _decode_output(err.get("raw", b""))
+
+def _unavailable(feature: str) -> Dict[str, Any]:
+    return {"success": False, "message": f"{feature} unavailable", "natural_response": f"{feature} isn't available on this system."}
+
 # Function Registry
 AVAILABLE_TOOLS = {
     "save_memory": {
@@ -93,7 +250,8 @@ AVAILABLE_TOOLS = {
             "text": "For typing",
             "key": "For pressing",
             "x": "x-coordinate",
-            "y": "y-coordinate"
+            "y": "y-coordinate",
+            "method": "Optional for type: paste (default) or keys (real keystrokes)"
         }
     },
     "window_ops": {
@@ -116,50 +274,46 @@ AVAILABLE_TOOLS = {
     }
 }
 
+# Serialized once - the registry never changes at runtime
+AVAILABLE_TOOLS_JSON = orjson.dumps(AVAILABLE_TOOLS)
+
+# Gemini Function Declarations - built once from AVAILABLE_TOOLS for native
+# function calling (all parameters are strings unless listed here)
+_PARAM_TYPES = {"level": "integer", "x": "integer", "y": "integer"}
+
+def _function_declaration(name: str, spec: Dict[str, Any]) -> Dict[str, Any]:
+    declaration = {"name": name, "description": spec["description"]}
+    if spec["parameters"]:
+        declaration["parameters"] = {
+            "type": "object",
+            "properties": {
+                param: {"type": _PARAM_TYPES.get(param, "string"), "description": description}
+                for param, description in spec["parameters"].items()
+            }
+        }
+    return declaration
+
+FUNCTION_DECLARATIONS = [_function_declaration(name, spec) for name, spec in AVAILABLE_TOOLS.items()]
+
 def execute_function(function_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
     """Execute a function based on Gemini's decision"""
     
-    print(colored(f"⚙️ Executing: {function_name}", "blue"))
-    print(colored(f"   Arguments: {arguments}", "blue"))
+    log.info("⚙️ Executing: %s args=%s", function_name, arguments)
     
     try:
-        if function_name == "save_memory":
-            return save_memory_tool(**arguments)
-        elif function_name == "recall_memory":
-            return recall_memory_tool(**arguments)
-        elif function_name == "run_command" or function_name == "run_terminal":
-            return run_command_tool(**arguments)
-        elif function_name == "open_app":
-            return open_app_tool(**arguments)
-        elif function_name == "web_scrape":
-            return web_scrape_tool(**arguments)
-        elif function_name == "web_search":
-            return web_search_tool(**arguments)
-        elif function_name == "tell_joke":
-            return tell_joke_tool()
-        elif function_name == "system_info":
-            return system_info_tool(**arguments)
-        elif function_name == "volume_control":
-            return volume_control_tool(**arguments)
-        elif function_name == "brightness_control":
-            return brightness_control_tool(**arguments)
-        elif function_name == "take_screenshot":
-            return take_screenshot_tool(**arguments)
-        elif function_name == "input_simulation":
-            return input_simulation_tool(**arguments)
-        elif function_name == "window_ops":
-            return window_ops_tool(**arguments)
-        elif function_name == "power_control":
-            return power_control_tool(**arguments)
-        elif function_name == "reply":
-            return reply_tool(**arguments)
-        else:
+        tool = _DISPATCH.get(function_name)
+        if tool is None:
             return {
                 "success": False,
                 "message": f"Unknown function: {function_name}"
             }
+        accepted = _ACCEPTED[function_name]
+        if not accepted.issuperset(arguments):
+            log.debug("Dropping unexpected arguments for %s: %s", function_name, set(arguments) - accepted)
+            arguments = {key: value for key, value in arguments.items() if key in accepted}
+        return tool(**arguments)
     except Exception as e:
-        print(colored(f"❌ Function Execution Error: {e}", "red"))
+        log.error("❌ Function Execution Error: %s", e)
         return {
             "success": False,
             "message": f"Error executing {function_name}: {str(e)}"
@@ -182,7 +336,7 @@ def save_memory_tool(text: str, importance: str = "medium", category: str = "fac
 
 def recall_memory_tool(query: str) -> Dict[str, Any]:
     """Search memory explicitly"""
-    memories = retrieve_context(query, top_k=5)
+    memories, _ = retrieve_context(query, top_k=5)
     if memories:
         results = [m["content"] for m in memories]
         return {"success": True, "message": f"Found {len(memories)} memories", "data": results, "natural_response": f"I found this: {results[0]}"}
@@ -192,8 +346,7 @@ def recall_memory_tool(query: str) -> Dict[str, Any]:
 def run_command_tool(command: str) -> Dict[str, Any]:
     """Execute a shell command with safety checks"""
     # Harmful command blocklist
-    harmful_keywords = ["rm -rf", "format", "del /s /q", "rd /s /q", "mkfs", "dd if="]
-    if any(keyword in command.lower() for keyword in harmful_keywords):
+    if _HARMFUL_RE.search(command):
         return {
             "success": False,
             "message": "Harmful command detected",
@@ -201,10 +354,16 @@ def run_command_tool(command: str) -> Dict[str, Any]:
         }
 
     try:
-        result = subprocess.run(command, shell=True, capture_output=True, text=True, timeout=10)
-        output = result.stdout.strip()
-        if not output and result.stderr:
-            output = result.stderr.strip()
+        # Plain commands are exec'd directly - no extra sh/cmd.exe process
+        direct = _direct_argv(command)
+        if direct is not None:
+            stdout, stderr = _run_bounded(direct)
+        else:
+            stdout, stderr = _run_bounded(command, shell=True)
+        
+        output = stdout
+        if not output and stderr:
+            output = stderr
             
         return {
             "success": True, 
@@ -217,112 +376,255 @@ def run_command_tool(command: str) -> Dict[str, Any]:
 
 def open_app_tool(app_name: str) -> Dict[str, Any]:
     """Open a native application"""
-    app_map = {
-        "notepad": "notepad.exe", "calculator": "calc.exe", "calc": "calc.exe",
-        "explorer": "explorer.exe", "paint": "mspaint.exe", "cmd": "cmd.exe",
-        "terminal": "cmd.exe", "powershell": "powershell.exe",
-        "settings": "start ms-settings:", "control panel": "control.exe",
-        "spotify": "start spotify:", "vscode": "code", "word": "start winword",
-        "excel": "start excel", "powerpoint": "start powerpnt", "chrome": "start chrome",
-        "browser": "start chrome"
-    }
-    executable = app_map.get(app_name.lower(), app_name)
+    executable = _APP_MAP.get(app_name.lower(), app_name)
     try:
-        subprocess.Popen(executable, shell=True)
+        target = executable[6:] if executable.lower().startswith("start ") else None
+        path = None if target else _which(executable)
+        if path:
+            subprocess.Popen([path])
+        elif os.name == "nt":
+            # ShellExecute resolves URIs (spotify:) and App Paths (winword) like
+            # cmd's "start" does, without spawning cmd.exe
+            os.startfile(target or executable)
+        else:
+            subprocess.Popen(executable, shell=True)
         return {"success": True, "message": f"Opened {app_name}", "natural_response": f"Opening {app_name}."}
     except Exception as e:
         return {"success": False, "message": str(e), "natural_response": f"Couldn't open {app_name}."}
 
+# Default browser controller, looked up on first use (None if there isn't one)
+_browser_controller = None
+_browser_checked = False
+
+def _open_url(url: str) -> None:
+    global _browser_controller, _browser_checked
+    if not _browser_checked:
+        try:
+            _browser_controller = webbrowser.get()
+        except webbrowser.Error:
+            _browser_controller = None
+        _browser_checked = True
+    if _browser_controller is not None:
+        _browser_controller.open(url)
+    else:
+        webbrowser.open(url)
+
 def web_scrape_tool(target: str, query: str = None) -> Dict[str, Any]:
-    import webbrowser
-    import urllib.parse
-    
-    url = target
-    if not url.startswith("http"):
-         url = f"https://www.google.com/search?q={urllib.parse.quote(target)}"
-         
     if query:
-        url = f"https://www.google.com/search?q={urllib.parse.quote(target + ' ' + query)}"
+        url = f"{_SEARCH_URL}{urllib.parse.quote_plus(target + ' ' + query)}"
+    elif target.startswith("http"):
+        url = target
+    else:
+        url = f"{_SEARCH_URL}{urllib.parse.quote_plus(target)}"
         
-    webbrowser.open(url)
+    _open_url(url)
     return {"success": True, "message": f"Opened {url}", "natural_response": f"Opening {target}."}
 
 def web_search_tool(query: str) -> Dict[str, Any]:
-    import webbrowser
-    webbrowser.open(f"https://www.google.com/search?q={query}")
+    _open_url(f"{_SEARCH_URL}{urllib.parse.quote_plus(query)}")
     return {"success": True, "message": f"Searching {query}", "natural_response": f"Searching for {query}."}
 
 def tell_joke_tool() -> Dict[str, Any]:
-    import random
-    jokes = [
-        "Why don't programmers like nature? It has too many bugs!",
-        "Why do Java developers wear glasses? Because they don't C#!",
-        "How many programmers does it take to change a light bulb? None, that's a hardware problem!"
-    ]
-    return {"success": True, "natural_response": random.choice(jokes)}
+    return {"success": True, "natural_response": random.choice(_JOKES)}
+
+# CPU usage is a delta between two samples; a background task keeps a fresh
+# reading so system_info never has to block for one
+CPU_SAMPLE_INTERVAL = 2.0  # seconds
+_cpu_percent: Optional[float] = None
+_cpu_task: Optional[asyncio.Task] = None
+
+if psutil is not None:
+    psutil.cpu_percent(interval=None)  # Arm the baseline for the first reading
+
+async def _cpu_sample_loop() -> None:
+    global _cpu_percent
+    while True:
+        await asyncio.sleep(CPU_SAMPLE_INTERVAL)
+        _cpu_percent = psutil.cpu_percent(interval=None)
+
+def start_cpu_sampler() -> None:
+    """Start the CPU sampling task on the running event loop (idempotent)"""
+    global _cpu_task
+    if psutil is None or (_cpu_task is not None and not _cpu_task.done()):
+        return
+    _cpu_task = asyncio.get_running_loop().create_task(_cpu_sample_loop())
+
+# Repeat system_info calls within the TTL reuse the last snapshot
+SYSINFO_CACHE_TTL = 2.0  # seconds
+_sysinfo_cache: Dict[str, tuple] = {}
 
 def system_info_tool(info_type: str = "all") -> Dict[str, Any]:
-    import psutil
+    if psutil is None:
+        return _unavailable("System info")
+    now = time.monotonic()
+    cached = _sysinfo_cache.get(info_type)
+    if cached is not None and now - cached[0] < SYSINFO_CACHE_TTL:
+        return cached[1]
+    
     info = []
     if info_type in ["battery", "all"]:
         b = psutil.sensors_battery()
         if b: info.append(f"Battery: {b.percent}%")
     if info_type in ["cpu", "all"]:
-        info.append(f"CPU: {psutil.cpu_percent()}%")
+        cpu = _cpu_percent if _cpu_percent is not None else psutil.cpu_percent(interval=None)
+        info.append(f"CPU: {cpu}%")
     if info_type in ["memory", "all"]:
         m = psutil.virtual_memory()
         info.append(f"RAM: {m.percent}%")
-    return {"success": True, "data": "\n".join(info), "natural_response": f"System status:\n{', '.join(info)}"}
+    if info_type in ["disk", "all"]:
+        d = psutil.disk_usage(os.path.abspath(os.sep))  # System drive
+        info.append(f"Disk: {d.percent}% used, {d.free // 2**30} GB free")
+    result = {"success": True, "data": "\n".join(info), "natural_response": f"System status:\n{', '.join(info)}"}
+    _sysinfo_cache[info_type] = (now, result)
+    return result
+
+# COM is initialized per thread; worker threads are reused, so do it once each.
+# Every worker joins the multithreaded apartment, which is what lets the one
+# cached volume interface be called from whichever thread runs the tool.
+_com_local = threading.local()
+
+def _ensure_com() -> bool:
+    """Join this thread to the MTA; False if it is already a single-threaded apartment"""
+    if not hasattr(_com_local, "mta"):
+        try:
+            CoInitializeEx(COINIT_MULTITHREADED)
+            _com_local.mta = True
+        except OSError:
+            # RPC_E_CHANGED_MODE - this thread is STA, so the shared MTA interface
+            # can't be called from it without marshaling
+            _com_local.mta = False
+    return _com_local.mta
+
+# Show the Windows volume OSD after setting an exact level (KURO_VOLUME_OSD=0 to skip)
+VOLUME_OSD = os.getenv("KURO_VOLUME_OSD", "1") == "1"
+
+# PowerShell fallback when pycaw is unavailable - sets the default endpoint's
+# master volume through Core Audio in one call instead of pumping ~100 key presses
+_PS_VOLUME_TYPE = '''Add-Type -TypeDefinition @"
+using System.Runtime.InteropServices;
+[Guid("5CDF2C82-841E-4546-9722-0CF74078229A"), InterfaceType(ComInterfaceType.InterfaceIsIUnknown)]
+interface IAudioEndpointVolume {
+    int f(); int g(); int h(); int i();
+    int SetMasterVolumeLevelScalar(float fLevel, System.Guid pguidEventContext);
+    int j();
+    int GetMasterVolumeLevelScalar(out float pfLevel);
+}
+[Guid("D666063F-1587-4E43-81F1-B948E807363F"), InterfaceType(ComInterfaceType.InterfaceIsIUnknown)]
+interface IMMDevice {
+    int Activate(ref System.Guid id, int clsCtx, int activationParams, out IAudioEndpointVolume aev);
+}
+[Guid("A95664D2-9614-4F35-A746-DE8DB63617E6"), InterfaceType(ComInterfaceType.InterfaceIsIUnknown)]
+interface IMMDeviceEnumerator {
+    int f();
+    int GetDefaultAudioEndpoint(int dataFlow, int role, out IMMDevice endpoint);
+}
+[ComImport, Guid("BCDE0395-E52F-467C-8E3D-C4579291692E")] class MMDeviceEnumeratorComObject { }
+public class KuroAudio {
+    public static float Volume {
+        set {
+            var enumerator = new MMDeviceEnumeratorComObject() as IMMDeviceEnumerator;
+            IMMDevice device = null;
+            Marshal.ThrowExceptionForHR(enumerator.GetDefaultAudioEndpoint(0, 1, out device));
+            IAudioEndpointVolume volume = null;
+            var iid = typeof(IAudioEndpointVolume).GUID;
+            Marshal.ThrowExceptionForHR(device.Activate(ref iid, 23, 0, out volume));
+            Marshal.ThrowExceptionForHR(volume.SetMasterVolumeLevelScalar(value, System.Guid.Empty));
+        }
+    }
+}
+"@'''
+
+# Speaker endpoint interface, activated on first use and reused after that
+_volume_iface = None
+_volume_lock = threading.Lock()
+
+def _get_volume_iface():
+    global _volume_iface
+    with _volume_lock:
+        if _volume_iface is None:
+            devices = AudioUtilities.GetSpeakers()
+            interface = devices.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
+            _volume_iface = cast(interface, POINTER(IAudioEndpointVolume))
+        return _volume_iface
+
+def _reset_volume_iface() -> None:
+    global _volume_iface
+    with _volume_lock:
+        _volume_iface = None
+
+# Relative actions -> (media key, presses). 'volumemute' toggles, so unmute
+# presses it too; 5 presses is roughly 10%.
+_VOLUME_KEYS = {
+    "mute": ("volumemute", 1),
+    "unmute": ("volumemute", 1),
+    "up": ("volumeup", 5),
+    "down": ("volumedown", 5),
+}
+
+def prewarm_volume() -> None:
+    """Activate the speaker interface at startup so the first set-volume is instant"""
+    if AudioUtilities is None:
+        return
+    try:
+        if not _ensure_com():
+            log.warning("⚠️ Volume interface prewarm skipped: startup thread is not in the MTA")
+            return
+        _get_volume_iface()
+    except Exception as e:
+        log.warning("⚠️ Volume interface prewarm failed: %s", e)
 
 def volume_control_tool(action: str = "set", level: int = None) -> Dict[str, Any]:
     """Control system volume. Uses media keys for up/down to show OSD."""
+    if pyautogui is None:
+        return _unavailable("Volume control")
     try:
-        import pyautogui
-        
         # Use media keys for relative changes (Triggers Windows OSD)
-        if action == "mute" or (action == "set" and level == 0):
-            pyautogui.press("volumemute")
-            return {"success": True, "natural_response": ""}
-            
-        elif action == "unmute":
-            # Windows toggle behavior is tricky, but 'volumemute' toggles it. 
-            # If we want to strictly UNMUTE, we might need pycaw, but let's try toggle first.
-           pyautogui.press("volumemute")
-           return {"success": True, "natural_response": ""}
-           
-        elif action == "up":
-            # Press multiple times for significant change (e.g., 5 times = ~10%)
-            pyautogui.press("volumeup", presses=5) 
-            return {"success": True, "natural_response": ""}
-            
-        elif action == "down":
-            pyautogui.press("volumedown", presses=5)
+        if action == "set" and level == 0:
+            action = "mute"
+        keys = _VOLUME_KEYS.get(action)
+        if keys is not None:
+            key, presses = keys
+            pyautogui.press(key, presses=presses)
             return {"success": True, "natural_response": ""}
             
         # For setting specific levels, we still need pycaw
-        elif level is not None or action == "set":
+        if level is not None or action == "set":
             target_level = level if level is not None else 50
             
             try:
                 # Primary Method: Pycaw (Direct System Control)
-                from comtypes import CoInitialize
-                CoInitialize() # Initialize COM for this thread (Critical for FastAPI)
-                from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
-                from ctypes import cast, POINTER
-                from comtypes import CLSCTX_ALL
+                if AudioUtilities is None:
+                    raise ImportError("pycaw is not installed")
+                if not _ensure_com(): # No-op after this thread's first call (Critical for FastAPI)
+                    raise OSError("COM apartment is STA on this thread")
                 
-                devices = AudioUtilities.GetSpeakers()
-                interface = devices.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
-                volume = cast(interface, POINTER(IAudioEndpointVolume))
-                volume.SetMasterVolumeLevelScalar(target_level / 100.0, None)
+                try:
+                    _get_volume_iface().SetMasterVolumeLevelScalar(target_level / 100.0, None)
+                except Exception:
+                    # Output device changed or COM object went stale - re-activate once
+                    _reset_volume_iface()
+                    _get_volume_iface().SetMasterVolumeLevelScalar(target_level / 100.0, None)
                 
-                # Visual Confirmation (Wiggle)
-                pyautogui.press(['volumeup', 'volumedown'])
+                # Visual Confirmation (Wiggle) - ~100ms of key events, so optional
+                if VOLUME_OSD:
+                    pyautogui.press(['volumeup', 'volumedown'])
                 return {"success": True, "natural_response": ""}
                 
             except Exception as e:
-                print(colored(f"⚠️ Pycaw failed ({e}), using key-press fallback...", "yellow"))
-                # Fallback Method: Manual Key Presses (Reliable but visual)
+                powershell = _which("powershell") if os.name == "nt" else None
+                if powershell:
+                    log.warning("⚠️ Pycaw failed (%s), setting volume via PowerShell...", e)
+                    # Fallback Method: one Core Audio call in a background PowerShell
+                    script = f"{_PS_VOLUME_TYPE}\n[KuroAudio]::Volume = {target_level / 100.0:.2f}"
+                    subprocess.Popen(
+                        [powershell, "-NoProfile", "-NonInteractive", "-Command", script],
+                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                        creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0)
+                    )
+                    return {"success": True, "natural_response": ""}
+                
+                log.warning("⚠️ Pycaw failed (%s), using key-press fallback...", e)
+                # Last Resort: Manual Key Presses (Reliable but visual)
                 # 1. Reset to 0 (50 taps down roughly covers 100% on most systems)
                 pyautogui.press('volumedown', presses=50, interval=0.01)
                 
@@ -336,27 +638,104 @@ def volume_control_tool(action: str = "set", level: int = None) -> Dict[str, Any
         return {"success": False, "natural_response": ""}
             
     except Exception as e:
-        print(colored(f"❌ Volume Error: {e}", "red"))
+        log.error("❌ Volume Error: %s", e)
         return {"success": False, "natural_response": ""}
 
+# Last brightness Kuro read or set - each sbc query is a WMI/DDC-CI round-trip,
+# so relative changes within BRIGHTNESS_CACHE_TTL reuse it instead of re-reading
+BRIGHTNESS_CACHE_TTL = 5.0  # seconds
+_brightness: Optional[tuple] = None  # (level, monotonic timestamp)
+
+def _current_brightness(fresh: bool = False) -> int:
+    """Brightness level - fresh skips the cache (the user may have changed it outside Kuro)"""
+    global _brightness
+    if not fresh and _brightness is not None and time.monotonic() - _brightness[1] < BRIGHTNESS_CACHE_TTL:
+        return _brightness[0]
+    level = sbc.get_brightness()[0]
+    _brightness = (level, time.monotonic())
+    return level
+
+def _set_brightness(level: int) -> None:
+    global _brightness
+    level = max(0, min(100, level))
+    sbc.set_brightness(level)
+    _brightness = (level, time.monotonic())
+
 def brightness_control_tool(action: str = "set", level: int = None) -> Dict[str, Any]:
+    if sbc is None:
+        return _unavailable("Brightness control")
     try:
-        import screen_brightness_control as sbc
         if action == "get":
-            return {"success": True, "natural_response": f"Brightness: {sbc.get_brightness()[0]}%"}
-        if action == "set" and level is not None: sbc.set_brightness(level)
-        elif action == "up": sbc.set_brightness('+10')
-        elif action == "down": sbc.set_brightness('-10')
+            return {"success": True, "natural_response": f"Brightness: {_current_brightness(fresh=True)}%"}
+        if action == "set" and level is not None: _set_brightness(level)
+        elif action == "up": _set_brightness(_current_brightness() + 10)
+        elif action == "down": _set_brightness(_current_brightness() - 10)
         return {"success": True, "natural_response": ""}
     except Exception:
         return {"success": False, "natural_response": ""}
 
-def input_simulation_tool(action: str, text: str = None, key: str = None, x: int = None, y: int = None) -> Dict[str, Any]:
+_PASTE_HOTKEY = ("command", "v") if sys.platform == "darwin" else ("ctrl", "v")
+CLIPBOARD_RESTORE_DELAY = 0.5  # seconds - give the target app time to read the paste
+
+CF_UNICODETEXT = 13
+
+def _clipboard_is_text(previous: str) -> bool:
+    """Whether the clipboard holds only what pyperclip can put back (text or nothing)"""
+    if os.name == "nt":
+        user32 = ctypes.windll.user32
+        return not user32.CountClipboardFormats() or bool(user32.IsClipboardFormatAvailable(CF_UNICODETEXT))
+    # pyperclip reads images/files as "" - can't tell them from an empty clipboard, so don't risk it
+    return previous != ""
+
+# One pending clipboard restore at a time - back-to-back pastes must put back the
+# user's original clipboard, not the text of the previous paste
+_clipboard_lock = threading.Lock()
+_clipboard_restore: Dict[str, Any] = {"token": None, "timer": None, "previous": None}
+
+def _restore_clipboard(token: object) -> None:
+    with _clipboard_lock:
+        if _clipboard_restore["token"] is not token:
+            return  # A later paste took over the restore
+        try:
+            pyperclip.copy(_clipboard_restore["previous"])
+        except Exception as e:
+            log.warning("⚠️ Clipboard restore failed: %s", e)
+        _clipboard_restore.update(token=None, timer=None, previous=None)
+
+def _paste_text(text: str) -> bool:
+    """Type text as one clipboard paste instead of a keypress per character"""
+    if pyperclip is None:
+        return False
+    with _clipboard_lock:
+        try:
+            if _clipboard_restore["timer"] is not None:
+                _clipboard_restore["timer"].cancel()  # Still holds our last paste; keep the original
+                previous = _clipboard_restore["previous"]
+            else:
+                previous = pyperclip.paste()
+                if not _clipboard_is_text(previous):
+                    return False  # Leave an image/file on the clipboard alone
+            pyperclip.copy(text)
+        except Exception:
+            return False
+        pyautogui.hotkey(*_PASTE_HOTKEY)
+        # Put the user's clipboard back once the paste has landed
+        token = object()
+        restore = threading.Timer(CLIPBOARD_RESTORE_DELAY, _restore_clipboard, args=(token,))
+        restore.daemon = True
+        _clipboard_restore.update(token=token, timer=restore, previous=previous)
+        restore.start()
+    return True
+
+def input_simulation_tool(action: str, text: str = None, key: str = None, x: int = None, y: int = None, method: str = "paste") -> Dict[str, Any]:
     """Simulate Mouse & Keyboard Input"""
-    import pyautogui
+    if pyautogui is None:
+        return _unavailable("Input simulation")
     try:
         if action == "type" and text:
-            pyautogui.write(text, interval=0.05)
+            # method="keys" for apps that block paste or act on each keystroke
+            if method == "keys" or not _paste_text(text):
+                pyautogui.write(text, interval=0.05)  # Keystroke fallback (no clipboard access)
         elif action == "press" and key:
             # Handle special keys safely
             pyautogui.press(key)
@@ -373,7 +752,8 @@ def input_simulation_tool(action: str, text: str = None, key: str = None, x: int
 
 def window_ops_tool(action: str) -> Dict[str, Any]:
     """Manage Windows"""
-    import pyautogui
+    if pyautogui is None:
+        return _unavailable("Window control")
     try:
         if action == "minimize":
             pyautogui.hotkey('win', 'down')
@@ -389,30 +769,60 @@ def window_ops_tool(action: str) -> Dict[str, Any]:
     except Exception as e:
         return {"success": False, "natural_response": ""}
 
+# Power actions -> (argv, spoken confirmation)
+_POWER_ACTIONS = {
+    "shutdown": (["shutdown", "/s", "/t", "10"], "Shutting down in 10 seconds..."),
+    "restart": (["shutdown", "/r", "/t", "10"], "Restarting in 10 seconds..."),
+    "sleep": (["rundll32.exe", "powrprof.dll,SetSuspendState", "0,1,0"], "Going to sleep..."),
+}
+
 def power_control_tool(action: str) -> Dict[str, Any]:
     """Power Management"""
-    import os
     try:
-        if action == "shutdown":
-            os.system("shutdown /s /t 10")
-            return {"success": True, "natural_response": "Shutting down in 10 seconds..."}
-        elif action == "restart":
-            os.system("shutdown /r /t 10")
-            return {"success": True, "natural_response": "Restarting in 10 seconds..."}
-        elif action == "sleep":
-            os.system("rundll32.exe powrprof.dll,SetSuspendState 0,1,0")
-            return {"success": True, "natural_response": "Going to sleep..."}
-        return {"success": False, "natural_response": "Unknown power action."}
+        entry = _POWER_ACTIONS.get(action)
+        if entry is None:
+            return {"success": False, "natural_response": "Unknown power action."}
+        argv, response = entry
+        # Fire and forget - no shell, and the reply goes out before the machine sleeps
+        subprocess.Popen(argv, creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0))
+        return {"success": True, "natural_response": response}
     except Exception as e:
         return {"success": False, "natural_response": "Power control failed."}
 
+# Screenshot folder - resolved (and created) once at import
+_PICTURES_DIR = os.path.join(os.path.expanduser("~"), "Pictures")
+try:
+    os.makedirs(_PICTURES_DIR, exist_ok=True)
+except OSError:
+    pass
+
+# zlib level for screenshots - 1 encodes several times faster than the default
+# 6 for a slightly larger file
+SCREENSHOT_PNG_LEVEL = 1
+
+# mss handles are bound to the thread that created them, and tools run on
+# worker threads - keep one grabber per thread
+_mss_local = threading.local()
+
+def _screen_grabber():
+    sct = getattr(_mss_local, "sct", None)
+    if sct is None:
+        sct = _mss_local.sct = mss.mss()
+    return sct
+
 def take_screenshot_tool(filename: str = None) -> Dict[str, Any]:
-    import pyautogui
-    from datetime import datetime
-    if not filename: filename = f"kuro_screen_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-    path = os.path.join(os.path.expanduser("~"), "Pictures", filename)
+    if mss is None and pyautogui is None:
+        return _unavailable("Screenshot")
+    if not filename: filename = f"kuro_screen_{time.strftime('%Y%m%d_%H%M%S')}.png"
+    path = os.path.join(_PICTURES_DIR, filename)
     try:
-        pyautogui.screenshot().save(path)
+        if mss is not None:
+            # Native BitBlt straight into a PNG - no PIL image in between
+            sct = _screen_grabber()
+            shot = sct.grab(sct.monitors[1])  # Primary monitor, like pyautogui
+            mss.tools.to_png(shot.rgb, shot.size, level=SCREENSHOT_PNG_LEVEL, output=path)
+        else:
+            pyautogui.screenshot().save(path)
         return {"success": True, "natural_response": f"Screenshot saved to {path}"}
     except Exception as e:
          return {"success": False, "natural_response": f"Screenshot failed: {e}"}
@@ -421,3 +831,27 @@ def reply_tool(message: str = None, text: str = None) -> Dict[str, Any]:
     # Support both 'message' (prompt spec) and 'text' (common hallucination)
     response_text = message or text or "I'm here."
     return {"success": True, "message": "Replied", "natural_response": response_text}
+
+# Dispatch Table - function name -> implementation, built once at import
+_DISPATCH = {
+    "save_memory": save_memory_tool,
+    "recall_memory": recall_memory_tool,
+    "run_command": run_command_tool,
+    "run_terminal": run_command_tool,
+    "open_app": open_app_tool,
+    "web_scrape": web_scrape_tool,
+    "web_search": web_search_tool,
+    "tell_joke": tell_joke_tool,
+    "system_info": system_info_tool,
+    "volume_control": volume_control_tool,
+    "brightness_control": brightness_control_tool,
+    "take_screenshot": take_screenshot_tool,
+    "input_simulation": input_simulation_tool,
+    "window_ops": window_ops_tool,
+    "power_control": power_control_tool,
+    "reply": reply_tool,
+}
+
+# Parameters each tool accepts - extra keys the model invents are dropped
+# before the call instead of failing it with a TypeError
+_ACCEPTED = {name: frozenset(inspect.signature(tool).parameters) for name, tool in _DISPATCH.items()}
@@ -1,53 +1,253 @@
 import os
+import logging
 import io
-from groq import Groq
-from termcolor import colored
+import asyncio
+import functools
+import hashlib
+import tempfile
+from collections import OrderedDict
+from typing import AsyncIterator, Callable, Iterator, Optional, Tuple
+import httpx
+from groq import Groq, AsyncGroq
 from dotenv import load_dotenv
 
 load_dotenv()
 
+log = logging.getLogger("kuro.tts")
+
+TTS_MODEL = "canopylabs/orpheus-v1-english"
+TTS_VOICE = "autumn"
+
+# On-disk WAV cache, LRU by entry count - repeated phrases ("Opening chrome.")
+# are served from disk instead of being synthesized again
+TTS_CACHE_DIR = os.getenv("KURO_TTS_CACHE_DIR", os.path.join(tempfile.gettempdir(), "kuro_tts"))
+TTS_CACHE_MAXSIZE = 256
+TTS_CHUNK_SIZE = 4096  # bytes per streamed chunk
+TTS_PENDING_TIMEOUT = 30  # seconds to wait on another request's synthesis
+
 class KuroTTS:
     def __init__(self):
-        print(colored("🎤 Initializing Groq TTS...", "cyan"))
+        log.info("🎤 Initializing Groq TTS...")
         api_key = os.getenv("GROQ_API_KEY")
+        self.async_client = None  # Set by init_async() once the server's HTTP pool exists
+        self._file_cache = self._load_file_cache()
+        self._pending = {}  # key -> Future for syntheses in progress
         if not api_key:
-             print(colored("❌ Groq API Key missing in .env", "red"))
+             log.error("❌ Groq API Key missing in .env")
              self.client = None
              return
 
         try:
             self.client = Groq(api_key=api_key)
-            print(colored("✅ Groq TTS Ready", "green"))
+            log.info("✅ Groq TTS Ready")
         except Exception as e:
-            print(colored(f"❌ Failed to initialize Groq TTS: {e}", "red"))
+            log.error("❌ Failed to initialize Groq TTS: %s", e)
             self.client = None
 
+    def _load_file_cache(self) -> "OrderedDict[str, str]":
+        """Index WAVs left by earlier runs, oldest first"""
+        os.makedirs(TTS_CACHE_DIR, exist_ok=True)
+        paths = [os.path.join(TTS_CACHE_DIR, name) for name in os.listdir(TTS_CACHE_DIR) if name.endswith(".wav")]
+        paths.sort(key=os.path.getmtime)
+        return OrderedDict((os.path.basename(path)[:-4], path) for path in paths[-TTS_CACHE_MAXSIZE:])
+
+    def init_async(self, http_client: httpx.AsyncClient):
+        """Create the async Groq client on a shared, pooled HTTP client"""
+        api_key = os.getenv("GROQ_API_KEY")
+        if api_key:
+            self.async_client = AsyncGroq(api_key=api_key, http_client=http_client)
+
+    async def prewarm(self) -> None:
+        """Open the pooled connection to Groq so the first /tts skips the TLS handshake"""
+        if not self.async_client:
+            return
+        try:
+            await self.async_client.models.list()
+        except Exception as e:
+            log.warning("⚠️ Groq TTS prewarm failed: %s", e)
+
+    def generate_audio_stream(self, text: str) -> Iterator[bytes]:
+        """WAV bytes as Groq sends them (raises on failure)"""
+        with self.client.audio.speech.with_streaming_response.create(
+            model=TTS_MODEL,
+            voice=TTS_VOICE,
+            response_format="wav",
+            input=text,
+        ) as response:
+            yield from response.iter_bytes(TTS_CHUNK_SIZE)
+
     def generate_audio(self, text: str):
         if not self.client:
-            print(colored("❌ TTS Client not initialized", "red"))
+            log.error("❌ TTS Client not initialized")
             return None
 
-        print(colored(f"🗣️  Generating audio via Groq: '{text[:30]}...'", "cyan"))
+        log.debug("🗣️  Generating audio via Groq: '%.30s...'", text)
+        
+        try:
+            buffer = io.BytesIO(b"".join(self.generate_audio_stream(text)))
+            buffer.seek(0)
+            return buffer
+
+        except Exception as e:
+            log.error("❌ Groq TTS Generation Error: %s", e)
+            return None
+
+    async def generate_audio_async(self, text: str):
+        """Non-blocking generate_audio (falls back to the sync client in a thread)"""
+        if not self.async_client:
+            return await asyncio.to_thread(self.generate_audio, text)
+
+        log.debug("🗣️  Generating audio via Groq: '%.30s...'", text)
         
         try:
-            response = self.client.audio.speech.create(
-                model="canopylabs/orpheus-v1-english",
-                voice="autumn",
+            response = await self.async_client.audio.speech.create(
+                model=TTS_MODEL,
+                voice=TTS_VOICE,
                 response_format="wav",
                 input=text,
             )
-            
-            # Convert binary content to BytesIO buffer to match existing interface
-            # Note: BinaryAPIResponse might need .read() or .content depending on version
-            # User snippet used stream_to_file. .read() should get all bytes.
-            audio_data = response.read()
-            buffer = io.BytesIO(audio_data)
+            buffer = io.BytesIO(await response.read())
             buffer.seek(0)
             return buffer
 
         except Exception as e:
-            print(colored(f"❌ Groq TTS Generation Error: {e}", "red"))
+            log.error("❌ Groq TTS Generation Error: %s", e)
             return None
 
+    def _cache_key(self, text: str) -> Tuple[str, str]:
+        text = " ".join(text.split())  # Whitespace differences don't change the audio
+        return hashlib.sha1(f"{TTS_MODEL}|{TTS_VOICE}|{text}".encode("utf-8")).hexdigest(), text
+
+    async def cached_audio_file(self, text: str) -> Optional[str]:
+        """Path to an already synthesized WAV for text (waits for one in progress)"""
+        key, text = self._cache_key(text)
+        path = self._file_cache.get(key)
+        if path is not None and os.path.exists(path):
+            self._file_cache.move_to_end(key)
+            log.debug("⚡ TTS cache hit: '%.30s...'", text)
+            return path
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            return await _await_pending(pending)
+        return None
+
+    async def stream_audio(self, text: str) -> Optional[Tuple[AsyncIterator[bytes], Callable[[], None]]]:
+        """
+        (WAV chunks for text as Groq produces them, release callback), or None
+        if synthesis fails. The first chunk is fetched before returning so errors
+        surface here; the finished file is added to the disk cache. Call release
+        once the response is done in case the chunks were never consumed.
+        """
+        key, text = self._cache_key(text)
+        pending = self._pending.get(key)
+        if pending is not None:
+            path = await _await_pending(pending)
+            if path is not None:
+                return _file_chunks(path), _noop
+            if not pending.done():
+                pending.cancel()  # Stalled past TTS_PENDING_TIMEOUT - take over
+            if self._pending.get(key) is pending:
+                del self._pending[key]
+            if key in self._pending:
+                return await self.stream_audio(text)  # Someone else took over first
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        release = functools.partial(self._release, key, future)
+
+        log.debug("🗣️  Streaming audio via Groq: '%.30s...'", text)
+        chunks = self._stream_chunks(text)
+        try:
+            first = await chunks.__anext__()
+        except asyncio.CancelledError:
+            release()
+            raise
+        except Exception as e:
+            future.set_result(None)
+            release()
+            log.error("❌ Groq TTS Generation Error: %s", e)
+            return None
+        return self._stream_and_cache(key, first, chunks, future), release
+
+    def _release(self, key: str, future: asyncio.Future) -> None:
+        """Give up on a stream's pending entry - a no-op once it has been cached"""
+        if not future.done():
+            future.cancel()  # Client went away - nothing cached
+        if self._pending.get(key) is future:
+            del self._pending[key]
+
+    async def _stream_chunks(self, text: str) -> AsyncIterator[bytes]:
+        if not self.async_client:
+            buffer = await self.generate_audio_async(text)
+            if not buffer:
+                raise RuntimeError("TTS generation failed")
+            yield buffer.getvalue()
+            return
+
+        async with self.async_client.audio.speech.with_streaming_response.create(
+            model=TTS_MODEL,
+            voice=TTS_VOICE,
+            response_format="wav",
+            input=text,
+        ) as response:
+            async for chunk in response.iter_bytes(TTS_CHUNK_SIZE):
+                yield chunk
+
+    async def _stream_and_cache(self, key: str, first: bytes, chunks: AsyncIterator[bytes], future: asyncio.Future) -> AsyncIterator[bytes]:
+        parts = [first]
+        try:
+            yield first
+            async for chunk in chunks:
+                parts.append(chunk)
+                yield chunk
+            path = await self._store(key, b"".join(parts))
+            if not future.done():
+                future.set_result(path)
+        finally:
+            self._release(key, future)
+            await chunks.aclose()
+
+    async def _store(self, key: str, data: bytes) -> str:
+        path = os.path.join(TTS_CACHE_DIR, f"{key}.wav")
+        await asyncio.to_thread(_write_file, path, data)
+        self._file_cache[key] = path
+        self._file_cache.move_to_end(key)
+        if len(self._file_cache) > TTS_CACHE_MAXSIZE:
+            _, evicted = self._file_cache.popitem(last=False)
+            try:
+                os.remove(evicted)
+            except OSError:
+                pass  # Still being served - it'll be pruned on a later run
+        return path
+
+async def _await_pending(pending: asyncio.Future) -> Optional[str]:
+    try:
+        return await asyncio.wait_for(asyncio.shield(pending), TTS_PENDING_TIMEOUT)
+    except asyncio.TimeoutError:
+        return None  # Stuck synthesis - caller synthesizes itself
+    except asyncio.CancelledError:
+        if pending.cancelled():
+            return None  # The other request gave up - caller synthesizes itself
+        raise
+
+async def _file_chunks(path: str) -> AsyncIterator[bytes]:
+    with open(path, "rb") as f:
+        while True:
+            chunk = await asyncio.to_thread(f.read, TTS_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+def _noop() -> None:
+    pass
+
+def _write_file(path: str, data: bytes) -> None:
+    # Write then rename so a concurrent reader never sees a partial file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
 # Singleton instance
 tts_engine = KuroTTS()